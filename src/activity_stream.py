@@ -0,0 +1,65 @@
+"""
+Process-wide fan-out of the agent:activity Pub/Sub channel.
+
+One subscriber task per process holds a single Redis Pub/Sub connection and
+broadcasts every message through a ConnectionManager, which queues it for each
+/ws/events WebSocket and sends to all of them concurrently. Delivery is
+immediate, and the number of Redis connections does not grow with the number
+of clients.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from connection_manager import ConnectionManager
+from redis_client import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_CHANNEL = "agent:activity"
+_RESUBSCRIBE_DELAY_SECONDS = 1.0
+
+
+class ActivityStream:
+    def __init__(self, manager: ConnectionManager, channel: str = ACTIVITY_CHANNEL):
+        self.manager = manager
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = await async_redis_client.subscribe_to_channel(self.channel)
+                logger.info(f"Subscribed to {self.channel}")
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        await self.manager.broadcast(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Subscription to {self.channel} failed: {e}")
+                await asyncio.sleep(_RESUBSCRIBE_DELAY_SECONDS)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+
+events_manager = ConnectionManager()
+activity_stream = ActivityStream(events_manager)
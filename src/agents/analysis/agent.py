@@ -1,4 +1,6 @@
 import json
+import os
+import uuid
 from typing import List
 
 from google.adk.agents import LlmAgent
@@ -6,25 +8,32 @@ from google.adk.tools import FunctionTool
 
 from redis_client import redis_client
 
+# Synthesis results are fetched this many keys per MGET round trip.
+ANALYSIS_MGET_CHUNK = int(os.getenv("ANALYSIS_MGET_CHUNK", 500))
+
 def assess_feasibility(synthesis_keys: List[str]) -> dict:
     """Produce feasibility analysis for the synthesis results."""
     aggregated = {"sources": [], "score": 0.0}
-    scores = []
-    for key in synthesis_keys:
-        raw = redis_client.get(key)
-        if not raw:
-            continue
-        try:
-            data = json.loads(raw)
-        except Exception:
-            continue
-        aggregated["sources"].append({"key": key, "overlap": data.get("overlap", [])})
-        scores.append(data.get("feasibility", 0.0))
+    score_sum = 0.0
+    score_count = 0
+    # Each chunk is parsed and folded into running totals before the next one is fetched.
+    for start in range(0, len(synthesis_keys), ANALYSIS_MGET_CHUNK):
+        chunk = synthesis_keys[start:start + ANALYSIS_MGET_CHUNK]
+        for key, raw in zip(chunk, redis_client.mget(chunk) or []):
+            if not raw:
+                continue
+            try:
+                data = json.loads(raw)
+            except Exception:
+                continue
+            aggregated["sources"].append({"key": key, "overlap": data.get("overlap", [])})
+            score_sum += data.get("feasibility", 0.0)
+            score_count += 1
 
-    if scores:
-        aggregated["score"] = round(sum(scores) / len(scores), 2)
+    if score_count:
+        aggregated["score"] = round(score_sum / score_count, 2)
 
-    analysis_key = f"analysis:{int(redis_client.client.time()[0])}"
+    analysis_key = f"analysis:{uuid.uuid4().hex}"
     redis_client.set_with_ttl(analysis_key, json.dumps(aggregated), 3600)
     redis_client.publish_message("agent:activity", json.dumps({"agent": "analysis", "status": "completed", "key": analysis_key}))
     return aggregated
@@ -1,5 +1,8 @@
+import asyncio
 import json
 import os
+import threading
+import time
 import uuid
 import logging
 from typing import List, Optional, Dict, Any
@@ -15,11 +18,19 @@ from multi_modal_tools import generate_architecture_image, generate_example_vide
 
 import dspy
 import config
-from redis_client import redis_client
+from redis_client import RESEARCH_TASK_QUEUE, redis_client, async_redis_client, task_entry
+from agents.coordinator.cache import decomposition_cache
 from pydantic import BaseModel, Field
 
 logger = logging.getLogger(__name__)
 
+DSPY_DECOMPOSE_MODEL = os.getenv("DSPY_DECOMPOSE_MODEL", "gemini/gemini-2.0-flash-exp")
+# Optional path to a compiled DecomposeQuery program saved with `program.save(path)`.
+DSPY_DECOMPOSE_PROGRAM_PATH = os.getenv("DSPY_DECOMPOSE_PROGRAM_PATH")
+DSPY_INIT_RETRY_SECONDS = float(os.getenv("DSPY_INIT_RETRY_SECONDS", 300))
+# Number of concurrent LLM calls used when decomposing a batch of queries.
+DSPY_BATCH_THREADS = int(os.getenv("DSPY_BATCH_THREADS", 8))
+
 # --- Shared State Models ---
 
 class TaskStatus(str, Enum):
@@ -156,68 +167,161 @@ class DecomposeQuery(dspy.Signature):
         desc="A JSON list of simple, actionable search tasks. Each task should be a string."
     )
 
-def decompose_and_dispatch(query: str, session_id: str | None = None) -> List[str]:
-    """Decompose a high-level user request into multiple search/parse tasks."""
-    logger.info(f"Decomposing query: {query}, session_id: {session_id}")
-    tasks = []
-    
-    # DSPy logic
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        config.load_google_secrets()
-        api_key = os.getenv("GOOGLE_API_KEY")
-
-    dspy_enabled = False
-    if api_key:
-        try:
-            llm = dspy.LM("gemini/gemini-2.0-flash-exp", api_key=api_key)
-            dspy.settings.configure(lm=llm)
-            dspy_enabled = True
-        except Exception as e:
-            logger.error(f"DSPy initialization failed: {e}")
-            dspy_enabled = False
+class DecompositionEngine:
+    """
+    Builds the DSPy LM and decomposition program once and shares them across requests.
 
-    if dspy_enabled:
+    Initialization is lazy and thread-safe. The LM is bound to the program's own
+    predictors rather than to the global `dspy.settings`, so concurrent requests
+    never reconfigure each other. If no API key is available, or the LM cannot be
+    built, initialization is retried at most every DSPY_INIT_RETRY_SECONDS instead
+    of on every request.
+    """
+    def __init__(self, model: str = DSPY_DECOMPOSE_MODEL, program_path: str | None = DSPY_DECOMPOSE_PROGRAM_PATH):
+        self.model = model
+        self.program_path = program_path
+        self._lock = threading.Lock()
+        self._program = None
+        self._next_attempt = 0.0
+
+    def warm(self):
+        """Initializes the engine ahead of the first request."""
+        self._ensure_program()
+
+    def decompose(self, query: str) -> Optional[List[str]]:
+        """Returns the DSPy-decomposed tasks, or None when DSPy is unavailable or fails."""
+        program = self._ensure_program()
+        if program is None:
+            return None
         try:
-            decompose_predictor = dspy.Predict(DecomposeQuery)
-            result = decompose_predictor(query=query)
+            result = program(query=query)
             tasks = json.loads(result.tasks)
             logger.info(f"DSPy decomposed tasks: {tasks}")
+            return tasks
         except Exception as e:
             logger.error(f"DSPy decomposition failed: {e}")
-            dspy_enabled = False
-
-    if not dspy_enabled:
-        logger.info("Using fallback decomposition logic")
-        tasks = [
-            query,
-            f"{query} arXiv pdf",
-            f"{query} review article",
-            f"{query} survey",
-            f"{query} site:arxiv.org",
-        ]
-
-    pushed_task_ids = []
-    for t in tasks:
-        task_id = str(uuid.uuid4())
-        task_payload = json.dumps({"task_id": task_id, "type": "search_and_parse", "payload": {"query": t, "session_id": session_id}})
-        redis_client.push_task("tasks:research", task_payload)
-        pushed_task_ids.append(task_id)
-
-    if session_id:
-        redis_client.set_hash_field(
-            f"session:{session_id}", "tasks", json.dumps(pushed_task_ids)
-        )
-
-    redis_client.publish_message(
-        "agent:activity",
-        json.dumps(
-            {"agent": "coordinator", "status": "dispatched", "tasks": pushed_task_ids}
-        ),
-    )
+            return None
+
+    def decompose_batch(self, queries: List[str]) -> List[Optional[List[str]]]:
+        """Decomposes many queries with concurrent LLM calls; failed ones come back as None."""
+        program = self._ensure_program()
+        if program is None or not queries:
+            return [None] * len(queries)
+        examples = [dspy.Example(query=query).with_inputs("query") for query in queries]
+        try:
+            results = program.batch(examples, num_threads=DSPY_BATCH_THREADS, max_errors=len(examples), disable_progress_bar=True)
+        except Exception as e:
+            logger.error(f"DSPy batch decomposition failed: {e}")
+            return [None] * len(queries)
+        batch = []
+        for query, result in zip(queries, results):
+            if result is None:
+                batch.append(None)  # the parallel executor already logged the error
+                continue
+            try:
+                batch.append(json.loads(result.tasks))
+            except Exception as e:
+                logger.error(f"DSPy decomposition failed for {query!r}: {e}")
+                batch.append(None)
+        return batch
+
+    def _ensure_program(self):
+        if self._program is not None or time.monotonic() < self._next_attempt:
+            return self._program
+        with self._lock:
+            if self._program is None and time.monotonic() >= self._next_attempt:
+                self._program = self._build_program()
+                if self._program is None:
+                    self._next_attempt = time.monotonic() + DSPY_INIT_RETRY_SECONDS
+        return self._program
+
+    def _build_program(self):
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            config.load_google_secrets()
+            api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            logger.warning("GOOGLE_API_KEY is not set; DSPy decomposition is disabled")
+            return None
+        try:
+            program = dspy.Predict(DecomposeQuery)
+            if self.program_path and os.path.exists(self.program_path):
+                program.load(self.program_path)
+                logger.info(f"Loaded compiled decomposition program from {self.program_path}")
+            program.set_lm(dspy.LM(self.model, api_key=api_key))
+            return program
+        except Exception as e:
+            logger.error(f"DSPy initialization failed: {e}")
+            return None
+
+decomposition_engine = DecompositionEngine()
+
+def _fallback_tasks(query: str) -> List[str]:
+    return [
+        query,
+        f"{query} arXiv pdf",
+        f"{query} review article",
+        f"{query} survey",
+        f"{query} site:arxiv.org",
+    ]
+
+def _decompose_many(queries: List[str]) -> List[List[str]]:
+    """Decomposes queries, using the decomposition cache first and one concurrent DSPy batch for the misses."""
+    # Repeated and reworded queries reuse an earlier DSPy decomposition instead of calling the LLM
+    decomposed = decomposition_cache.get_many(queries)
+    misses = [i for i, tasks in enumerate(decomposed) if tasks is None]
+    if len(misses) == 1:
+        fresh = [decomposition_engine.decompose(queries[misses[0]])]
+    else:
+        fresh = decomposition_engine.decompose_batch([queries[i] for i in misses])
+    for i, tasks in zip(misses, fresh):
+        if tasks is not None:
+            decomposition_cache.put(queries[i], tasks)
+        else:
+            logger.info(f"Using fallback decomposition logic for {queries[i]!r}")
+            tasks = _fallback_tasks(queries[i])
+        decomposed[i] = tasks
+    return decomposed
+
+def _dispatch(requests: List[tuple], decomposed: List[List[str]]) -> List[List[str]]:
+    """Enqueues every task, records session task lists and announces them in a single transactional round trip."""
+    pipe = redis_client.pipeline(transaction=True)
+    dispatched = []
+    for (_, session_id), tasks in zip(requests, decomposed):
+        task_ids = []
+        for t in tasks:
+            task_id = str(uuid.uuid4())
+            task_payload = json.dumps({"task_id": task_id, "type": "search_and_parse", "payload": {"query": t, "session_id": session_id}})
+            if pipe is not None:
+                pipe.xadd(RESEARCH_TASK_QUEUE, task_entry(task_payload))
+            task_ids.append(task_id)
+        if pipe is not None:
+            if session_id:
+                pipe.hset(f"session:{session_id}", "tasks", json.dumps(task_ids))
+            pipe.publish(
+                "agent:activity",
+                json.dumps({"agent": "coordinator", "status": "dispatched", "tasks": task_ids}),
+            )
+        dispatched.append(task_ids)
+    if pipe is not None:
+        pipe.execute()
+    return dispatched
+
+def decompose_and_dispatch(query: str, session_id: str | None = None) -> List[str]:
+    """Decompose a high-level user request into multiple search/parse tasks."""
+    logger.info(f"Decomposing query: {query}, session_id: {session_id}")
+    requests = [(query, session_id)]
+    pushed_task_ids = _dispatch(requests, _decompose_many([query]))[0]
     logger.info(f"Dispatched {len(pushed_task_ids)} tasks")
     return pushed_task_ids
 
+def decompose_and_dispatch_batch(requests: List[tuple]) -> List[List[str]]:
+    """Decompose many (query, session_id) requests concurrently and dispatch all of their tasks in one batch."""
+    logger.info(f"Decomposing {len(requests)} queries")
+    dispatched = _dispatch(requests, _decompose_many([query for query, _ in requests]))
+    logger.info(f"Dispatched {sum(len(ids) for ids in dispatched)} tasks for {len(requests)} queries")
+    return dispatched
+
 async def process_voice_input(query: str, session_id: str, response_channel: str):
     """Processes a voice input query, decides on action, and publishes response."""
     logger.info(f"Processing voice input: {query}, session_id: {session_id}")
@@ -239,13 +343,13 @@ async def process_voice_input(query: str, session_id: str, response_channel: str
     else:
         # Fallback to existing decomposition logic
         logger.info("Delegating to decompose_and_dispatch")
-        tasks = decompose_and_dispatch(query, session_id)
+        tasks = await asyncio.to_thread(decompose_and_dispatch, query, session_id)
         response_data["text"] = f"I've decomposed your query into {len(tasks)} tasks."
         # In a real scenario, you might wait for research results before responding.
         # For now, just acknowledge the decomposition.
 
     logger.info(f"Publishing response to {response_channel}")
-    redis_client.publish_message(response_channel, json.dumps(response_data))
+    await async_redis_client.publish_message(response_channel, json.dumps(response_data))
     return "Voice input processed."
 
 
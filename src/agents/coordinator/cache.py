@@ -0,0 +1,195 @@
+"""
+Decomposition result cache with near-duplicate query matching.
+
+Decomposed tasks are stored in Redis under the normalized query, so repeats of
+a query skip the LLM. Rephrasings are found with MinHash signatures over the
+query's token shingles: each signature is split into LSH bands, and every band
+is a Redis set of the entries that share it. A lookup gathers the candidates
+that collide in at least one band and returns the one whose estimated Jaccard
+similarity is highest, provided it is at least DECOMPOSE_CACHE_SIMILARITY.
+
+Keys:
+- decompose:entry:{sha1(normalized query)}  hash of query, tasks, signature
+- decompose:lsh:{band}:{sha1(band values)}  set of entry ids
+Both expire after DECOMPOSE_CACHE_TTL_SECONDS.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import struct
+from typing import List, Optional
+
+from redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+DECOMPOSE_CACHE_TTL_SECONDS = int(os.getenv("DECOMPOSE_CACHE_TTL_SECONDS", 24 * 3600))
+DECOMPOSE_CACHE_SIMILARITY = float(os.getenv("DECOMPOSE_CACHE_SIMILARITY", 0.8))
+DECOMPOSE_CACHE_SHINGLE_SIZE = int(os.getenv("DECOMPOSE_CACHE_SHINGLE_SIZE", 1))
+
+_ENTRY_KEY_PREFIX = "decompose:entry:"
+_BAND_KEY_PREFIX = "decompose:lsh:"
+# 16 bands of 4 rows: pairs above ~0.5 similarity almost always share a band.
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+_ROWS_PER_BAND = NUM_PERMUTATIONS // LSH_BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+_STOP_WORDS = {
+    "a", "an", "and", "are", "about", "for", "from", "how", "in", "is", "me",
+    "of", "on", "or", "please", "the", "to", "what", "with",
+}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases a query and strips punctuation and extra whitespace."""
+    return " ".join(re.findall(r"[a-z0-9]+", query.lower()))
+
+
+def shingles(query: str, size: int = DECOMPOSE_CACHE_SHINGLE_SIZE) -> set:
+    tokens = [t for t in normalize_query(query).split() if t not in _STOP_WORDS]
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash_signature(query: str) -> Optional[List[int]]:
+    """
+    Returns the query's MinHash signature, or None if it has no shingles (e.g.
+    only stop words). Such queries would all share one constant signature and
+    match each other, so they are only ever looked up exactly.
+    """
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+        for s in shingles(query)
+    ]
+    if not hashes:
+        return None
+    return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def estimated_similarity(left: List[int], right: List[int]) -> float:
+    """Estimates the Jaccard similarity of two shingle sets from their signatures."""
+    return sum(1 for x, y in zip(left, right) if x == y) / len(left)
+
+
+def _band_keys(signature: List[int]) -> List[str]:
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND]
+        digest = hashlib.sha1(struct.pack(f"<{_ROWS_PER_BAND}I", *rows)).hexdigest()
+        keys.append(f"{_BAND_KEY_PREFIX}{band}:{digest}")
+    return keys
+
+
+class DecompositionCache:
+    def __init__(self, client=None, ttl_seconds: int = DECOMPOSE_CACHE_TTL_SECONDS, similarity: float = DECOMPOSE_CACHE_SIMILARITY):
+        self._client = client or redis_client
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+
+    @property
+    def _redis(self):
+        return self._client.get_client()
+
+    def get(self, query: str) -> Optional[List[str]]:
+        """Returns cached tasks for the query or a near-duplicate of it, or None."""
+        return self.get_many([query])[0]
+
+    def get_many(self, queries: List[str]) -> List[Optional[List[str]]]:
+        """
+        Looks up several queries at once, in request order.
+
+        The exact-match lookups, the LSH band lookups for the misses and the
+        candidate entries each take a single pipelined round trip, however many
+        queries there are.
+        """
+        results = [None] * len(queries)
+        redis = self._redis
+        if redis is None:
+            return results
+        try:
+            pipe = redis.pipeline(transaction=False)
+            for query in queries:
+                pipe.hget(self._entry_key(query), "tasks")
+            signatures = {}
+            for i, tasks in enumerate(pipe.execute()):
+                if tasks is not None:
+                    results[i] = json.loads(tasks)
+                else:
+                    signature = minhash_signature(queries[i])
+                    if signature is not None:
+                        signatures[i] = signature
+            if not signatures:
+                return results
+
+            pipe = redis.pipeline(transaction=False)
+            for signature in signatures.values():
+                for key in _band_keys(signature):
+                    pipe.smembers(key)
+            members = pipe.execute()
+            candidates = {
+                i: set().union(*members[n * LSH_BANDS:(n + 1) * LSH_BANDS])
+                for n, i in enumerate(signatures)
+            }
+            entry_ids = list(set().union(*candidates.values()))
+            if not entry_ids:
+                return results
+
+            pipe = redis.pipeline(transaction=False)
+            for entry_id in entry_ids:
+                pipe.hmget(_ENTRY_KEY_PREFIX + entry_id, "signature", "tasks", "query")
+            entries = dict(zip(entry_ids, pipe.execute()))
+        except Exception as e:
+            logger.warning(f"Decomposition cache read failed: {e}")
+            return results
+
+        for i, signature in signatures.items():
+            best, best_score = None, self.similarity
+            for entry_id in candidates[i]:
+                encoded, tasks, original = entries[entry_id]
+                if encoded is None or tasks is None:
+                    continue  # expired entry still referenced by a band
+                score = estimated_similarity(signature, json.loads(encoded))
+                if score >= best_score:
+                    best, best_score = (tasks, original), score
+            if best is not None:
+                logger.info(f"Decomposition cache near-duplicate hit ({best_score:.2f}) for {queries[i]!r} via {best[1]!r}")
+                results[i] = json.loads(best[0])
+        return results
+
+    def put(self, query: str, tasks: List[str]):
+        redis = self._redis
+        if redis is None:
+            return
+        entry_key = self._entry_key(query)
+        entry_id = entry_key[len(_ENTRY_KEY_PREFIX):]
+        signature = minhash_signature(query)
+        entry = {"query": query, "tasks": json.dumps(tasks)}
+        if signature is not None:
+            entry["signature"] = json.dumps(signature)
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.hset(entry_key, mapping=entry)
+            pipe.expire(entry_key, self.ttl_seconds)
+            if signature is not None:
+                for key in _band_keys(signature):
+                    pipe.sadd(key, entry_id)
+                    pipe.expire(key, self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Decomposition cache write failed: {e}")
+
+    @staticmethod
+    def _entry_key(query: str) -> str:
+        return _ENTRY_KEY_PREFIX + hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+decomposition_cache = DecompositionCache()
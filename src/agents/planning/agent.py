@@ -1,60 +1,145 @@
+import hashlib
 import json
-import re
-from typing import List
-from collections import Counter
-from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
 
 from google.adk.agents import LlmAgent
 from google.adk.tools import FunctionTool
 
+from paper_store import PAPER_KEY_PREFIX, term_vector_key
 from redis_client import redis_client
+from singleflight import SingleFlight
+from text_terms import TERM_COUNTS_FIELD, TERM_DICT_KEY, TERM_IDS_FIELD, TermVector, term_id_key, term_vector
+
+OVERLAP_TERMS = 10
+SYNTHESIS_TEXT_CHARS = 5000
+SYNTHESIS_TTL_SECONDS = int(os.getenv("SYNTHESIS_TTL_SECONDS", 3600))
+SYNTHESIS_KEY_PREFIX = "synthesis:"
+
+# Concurrent identical synthesis requests, in this process or another, compute the result once.
+_synthesis_flight = SingleFlight("synthesis", lease_seconds=60)
+
+def _shared_terms(vectors: List[TermVector], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merges term vectors into a sparse document-term matrix and selects the top terms.
+
+    Returns the IDs of the k terms found in more than one document with the
+    highest total counts (plus any tied with the k-th, so the caller's tie-break
+    is stable) and those totals. The work grows with the merged vocabulary, not
+    with document length.
+    """
+    vectors = [v for v in vectors if len(v.ids)]
+    if not vectors:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    vocabulary, cols = np.unique(np.concatenate([v.ids for v in vectors]), return_inverse=True)
+    rows = np.repeat(np.arange(len(vectors)), [len(v.ids) for v in vectors])
+    counts = np.concatenate([v.counts for v in vectors]).astype(np.int64)
+    matrix = csr_matrix((counts, (rows, cols)), shape=(len(vectors), len(vocabulary)))
+    doc_freq = np.bincount(matrix.indices, minlength=len(vocabulary))
+    total_freq = np.asarray(matrix.sum(axis=0)).ravel()
+
+    candidates = np.flatnonzero(doc_freq > 1)
+    if len(candidates) > k:
+        top = candidates[np.argpartition(-total_freq[candidates], k - 1)[:k]]
+        candidates = candidates[total_freq[candidates] >= total_freq[top].min()]
+    return vocabulary[candidates], total_freq[candidates]
+
+def _rank_terms(ids: np.ndarray, totals: np.ndarray, names: Dict[int, str], k: int) -> List[str]:
+    """Orders terms by total count, breaking ties alphabetically so results are deterministic."""
+    terms = np.array([names.get(int(tid), "") for tid in ids], dtype=object)
+    order = np.lexsort((terms.astype(str), -totals))
+    return [term for term in terms[order] if term][:k]
+
+def _overlap_terms(texts: List[str], k: int = OVERLAP_TERMS) -> List[str]:
+    """Returns the k terms found in more than one text, most frequent overall first."""
+    vectors, names = [], {}
+    for text in texts:
+        vector, local_names = term_vector(text)
+        vectors.append(vector)
+        names.update(local_names)
+    ids, totals = _shared_terms(vectors, k)
+    return _rank_terms(ids, totals, names, k)
+
+def _load_term_vectors(paper_ids: List[str]) -> Tuple[List[TermVector], List[int], Dict[int, str]]:
+    """Reads the stored term vectors and text lengths of papers in one round trip.
+
+    Papers stored before term vectors existed fall back to tokenizing their text.
+    """
+    fields = ["text_len", TERM_IDS_FIELD, TERM_COUNTS_FIELD]
+    keys = [term_vector_key(paper_id) for paper_id in paper_ids]
+    rows = redis_client.get_hash_fields_bulk(keys, fields, raw=True) or [[None] * len(fields) for _ in paper_ids]
+    vectors, lengths, names = [], [], {}
+    missing = []
+    for i, (text_len, tf_ids, tf_counts) in enumerate(rows):
+        if tf_ids is None or tf_counts is None:
+            missing.append(i)
+            vectors.append(None)
+            lengths.append(0)
+        else:
+            vectors.append(TermVector.decode(tf_ids, tf_counts))
+            lengths.append(int(text_len or 0))
+
+    if missing:
+        texts = redis_client.get_hash_fields_bulk([paper_ids[i] for i in missing], ["text"]) or [[None] for _ in missing]
+        for i, (text,) in zip(missing, texts):
+            text = (text or "")[:SYNTHESIS_TEXT_CHARS]
+            vectors[i], local_names = term_vector(text)
+            names.update(local_names)
+            lengths[i] = len(text)
+    return vectors, lengths, names
+
+def _paper_keys(paper_ids: List[str]) -> List[str]:
+    """Accepts IDs with or without the paper: prefix; returns sorted, de-duplicated keys."""
+    return sorted({pid if pid.startswith(PAPER_KEY_PREFIX) else PAPER_KEY_PREFIX + pid for pid in paper_ids})
+
+def _memo_key(paper_keys: List[str]) -> str:
+    """Derives the memo key from the sorted paper keys and each paper's content version, read in one round trip."""
+    rows = redis_client.get_hash_fields_bulk(paper_keys, ["content_hash", "stored_at"]) or [[None, None] for _ in paper_keys]
+    parts = [f"{key}@{content_hash or stored_at or ''}" for key, (content_hash, stored_at) in zip(paper_keys, rows)]
+    return SYNTHESIS_KEY_PREFIX + hashlib.sha1(",".join(parts).encode("utf-8")).hexdigest()
+
+def _memoized(memo_key: str) -> Optional[dict]:
+    raw = redis_client.get(memo_key)
+    return json.loads(raw) if raw else None
 
 def synthesize(paper_ids: List[str], synthesis_key: str | None = None) -> dict:
-    """Synthesize concepts from a list of parsed papers (paper:ID stored in redis)."""
-    texts = []
-    metadata = {}
-    for pid in paper_ids:
-        paper = redis_client.get_all_hash_fields(pid) or {}
-        text = paper.get("text", "")
-        title = paper.get("title", "")
-        texts.append(text[:5000])
-        metadata[pid] = {"title": title}
+    """Synthesize concepts from a list of parsed papers (paper:ID stored in redis).
+
+    Results are memoized under a hash of the sorted paper IDs and their content
+    versions, which is checked before any paper data is read.
+    """
+    paper_keys = _paper_keys(paper_ids)
+    memo_key = _memo_key(paper_keys)
+    synth = cached = _memoized(memo_key)
+    if cached is None:
+        synth = _synthesis_flight.do(memo_key, lambda: _synthesize(paper_keys, memo_key), lookup=lambda: _memoized(memo_key))
+
+    if synthesis_key:
+        redis_client.set_with_ttl(synthesis_key, json.dumps(synth), SYNTHESIS_TTL_SECONDS)
+    result_key = synthesis_key or memo_key
+    redis_client.publish_message("agent:activity", json.dumps({"agent": "planning", "status": "synthesized", "key": result_key, "cached": cached is not None}))
+    return synth
+
+def _synthesize(paper_ids: List[str], memo_key: str) -> dict:
+    vectors, doc_lengths, names = _load_term_vectors(paper_ids)
 
     synth = {"overlap": [], "feasibility": 0.0, "applications": []}
     
-    if texts:
-        clean_texts = [re.sub(r'[^a-zA-Z\s]', '', doc.lower()) for doc in texts]
-        doc_word_sets = [
-            set(word for word in doc.split() if word not in ENGLISH_STOP_WORDS and word)
-            for doc in clean_texts
-        ]
-
-        overlap_words = set()
-        if doc_word_sets:
-            word_doc_counts = Counter()
-            for word_set in doc_word_sets:
-                word_doc_counts.update(word_set)
-            
-            multi_doc_words = {word for word, count in word_doc_counts.items() if count > 1}
-            total_word_counts = Counter(word for doc in clean_texts for word in doc.split())
-            
-            sorted_multi_doc_words = sorted(
-                multi_doc_words, 
-                key=lambda w: total_word_counts.get(w, 0), 
-                reverse=True
-            )
-            overlap_words.update(sorted_multi_doc_words)
-
-        synth["overlap"] = list(overlap_words)[:10]
-        doc_lengths = [len(t) for t in texts]
+    if vectors:
+        ids, totals = _shared_terms(vectors, OVERLAP_TERMS)
+        unnamed = [int(tid) for tid in ids if int(tid) not in names]
+        if unnamed:
+            stored = redis_client.get_hash_fields(TERM_DICT_KEY, [term_id_key(tid) for tid in unnamed]) or []
+            names.update((tid, term) for tid, term in zip(unnamed, stored) if term)
+        synth["overlap"] = _rank_terms(ids, totals, names, OVERLAP_TERMS)
         synth["feasibility"] = round(min(10.0, sum(1 for dl in doc_lengths if dl > 1000) / max(1, len(doc_lengths)) * 10), 2)
         
         if synth["overlap"]:
             synth["applications"] = [f"Use {synth['overlap'][:3]} for optimization workflows"]
 
-    result_key = synthesis_key or f"synthesis:{','.join(paper_ids)}"
-    redis_client.set_with_ttl(result_key, json.dumps(synth), 3600)
-    redis_client.publish_message("agent:activity", json.dumps({"agent": "planning", "status": "synthesized", "key": result_key}))
+    redis_client.set_with_ttl(memo_key, json.dumps(synth), SYNTHESIS_TTL_SECONDS)
     return synth
 
 root_agent = LlmAgent(
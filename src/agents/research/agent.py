@@ -1,58 +1,112 @@
-import json
-import time
-from typing import List
 import asyncio
+import json
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 from google.adk.agents import LlmAgent
 from google.adk.tools import FunctionTool
 
-from mcp_client import get_tavily_mcp_client
-from redis_client import redis_client
+from mcp_client import get_tavily_mcp_pool
+from redis_client import async_redis_client
 from paper_parser import extract_text_from_url
+from paper_index import index_paper, search_papers_index
+from paper_store import known_papers, paper_id_for_url, store_paper
+from term_sketch import record_paper_terms
+from text_terms import term_counts
 
-def search_and_parse(query: str) -> List[str]:
-    """Searches for a query and parses the results, storing them in Redis."""
-    try:
-        async def _search():
-            async with get_tavily_mcp_client() as tavily_mcp:
-                return await tavily_mcp.search(query)
+logger = logging.getLogger(__name__)
 
-        result = asyncio.run(_search())
+# Per-task cap on concurrent downloads, so one task cannot occupy every fetch thread.
+RESEARCH_FETCH_CONCURRENCY = int(os.getenv("RESEARCH_FETCH_CONCURRENCY", 5))
+# Process-wide cap on concurrent downloads and parses, shared by every research task.
+_fetch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RESEARCH_FETCH_MAX_WORKERS", 16)),
+    thread_name_prefix="research-fetch",
+)
 
+def _extract_with_counts(url: str) -> Tuple[Optional[str], Counter]:
+    text = extract_text_from_url(url)
+    # Tokenizing up to a few MB of text is CPU work too, so it stays off the event loop.
+    return text, term_counts(text) if text else Counter()
+
+async def _fetch_text(hit: dict, limit: asyncio.Semaphore):
+    async with limit:
+        try:
+            loop = asyncio.get_running_loop()
+            text, counts = await loop.run_in_executor(_fetch_executor, _extract_with_counts, hit["url"])
+        except Exception as e:
+            logger.warning(f"Failed to fetch {hit['url']}: {e}")
+            text, counts = None, Counter()
+    return hit, text, counts
+
+async def _search(query: str) -> dict:
+    try:
+        # Searches share the process-wide pool of warm MCP sessions.
+        return await get_tavily_mcp_pool().search(query)
     except Exception as e:
-        redis_client.publish_message("agent:activity", json.dumps({"agent": "research", "status": "search_failed", "meta": str(e)}))
+        await async_redis_client.publish_message("agent:activity", json.dumps({"agent": "research", "status": "search_failed", "meta": str(e)}))
+        raise
+
+async def search_and_parse(query: str) -> List[str]:
+    """Searches for a query and parses the results, storing them in Redis."""
+    try:
+        result = await _search(query)
+    except Exception:
         return []
+    return await _parse_results(query, result)
+
+async def research_query(query: str) -> List[str]:
+    """Like search_and_parse, but search failures raise so callers such as the research worker can retry."""
+    return await _parse_results(query, await _search(query))
+
+async def _parse_results(query: str, result: dict) -> List[str]:
+    hits = [hit for hit in result.get("results", [])[:5] if hit.get("url")]
+    limit = asyncio.Semaphore(RESEARCH_FETCH_CONCURRENCY)
 
-    found = []
-    for hit in result.get("results", [])[:5]:
-        url = hit.get("url")
-        title = hit.get("title")
-        if not url:
-            continue
-        text = extract_text_from_url(url)
+    # Papers already stored (found earlier by this or another query) are not downloaded again.
+    known = await known_papers([paper_id_for_url(hit["url"]) for hit in hits])
+    found = [paper_id for paper_id, stored in known.items() if stored]
+    new_hits = [hit for hit in hits if not known[paper_id_for_url(hit["url"])]]
+
+    # All new hits download and parse in parallel; each paper is stored as soon as it is ready.
+    for fetch in asyncio.as_completed([_fetch_text(hit, limit) for hit in new_hits]):
+        hit, text, counts = await fetch
         if text:
-            paper_id = query[:32] + ":" + str(int(time.time()))
-            redis_client.set_hash_field(f"paper:{paper_id}", "title", title or "")
-            redis_client.set_hash_field(f"paper:{paper_id}", "url", url)
-            redis_client.set_hash_field(f"paper:{paper_id}", "text", text[:4000])
-            found.append(paper_id)
+            paper_id, created = await store_paper(hit["url"], hit.get("title"), text)
+            if created:
+                # The full extracted text is indexed, not just the stored excerpt.
+                if await index_paper(paper_id, counts):
+                    await record_paper_terms(paper_id, counts)
+            if paper_id not in found:
+                found.append(paper_id)
 
     if found:
-        redis_client.set_hash_field("last_search", query, json.dumps(found))
-        redis_client.publish_message("agent:activity", json.dumps({"agent": "research", "status": "completed", "found": found}))
+        await async_redis_client.set_hash_field("last_search", query, json.dumps(found))
+        await async_redis_client.publish_message("agent:activity", json.dumps({"agent": "research", "status": "completed", "found": found}))
     else:
-        redis_client.publish_message("agent:activity", json.dumps({"agent": "research", "status": "no_pdfs_found", "query": query}))
-    
+        await async_redis_client.publish_message("agent:activity", json.dumps({"agent": "research", "status": "no_pdfs_found", "query": query}))
+
     return found
 
+async def search_papers(query: str, limit: int = 10) -> List[dict]:
+    """Searches the papers already stored in Redis by keyword, ranked by BM25, without searching the web."""
+    return await search_papers_index(query, limit)
+
 root_agent = LlmAgent(
     name="research",
     model="gemini-2.0-flash-exp",
-    instruction="You are a research agent. You can search for papers and parse them.",
+    instruction="You are a research agent. You can search for papers and parse them, and search the papers already collected.",
     tools=[
         # Searches for a query and parses the results.
         FunctionTool(
             func=search_and_parse,
-        )
+        ),
+        # Searches the papers already stored by keyword.
+        FunctionTool(
+            func=search_papers,
+        ),
     ]
 )
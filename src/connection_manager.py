@@ -0,0 +1,177 @@
+"""
+WebSocket broadcasting with per-connection send queues.
+
+Every connection gets a bounded send queue drained by its own writer task, so
+broadcast() only enqueues and returns: sends to different clients happen
+concurrently and one slow or half-dead client cannot stall the others. When a
+client's queue is full, WS_SLOW_CONSUMER_POLICY decides what happens:
+
+- "drop": the oldest queued message for that client is discarded (default)
+- "disconnect": the client is closed so it can reconnect and catch up
+
+A send that takes longer than WS_SEND_TIMEOUT_SECONDS, or fails, closes the
+connection.
+
+Connections can opt into batching: the writer then waits batch_window seconds
+after the first queued message and sends everything queued by then (up to
+WS_BATCH_MAX_MESSAGES) as one frame holding an array of messages. Batched JSON
+frames join the queued JSON texts without re-encoding them. With the "msgpack"
+encoding every message is sent as a binary MessagePack frame; each broadcast is
+packed once for all such connections and a batch is just an array header
+followed by the packed messages. Compression (permessage-deflate) is negotiated
+by the server per connection and applies to either encoding.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Union
+
+from fastapi import WebSocket
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 256))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop")
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", 10))
+WS_BATCH_MAX_MESSAGES = int(os.getenv("WS_BATCH_MAX_MESSAGES", 256))
+
+ENCODINGS = ("json", "msgpack")
+
+Message = Union[str, bytes]
+
+
+def _pack(message: Message) -> bytes:
+    """Packs a JSON text message as MessagePack; anything else is packed as is."""
+    if isinstance(message, str):
+        try:
+            message = json.loads(message)
+        except ValueError:
+            pass
+    return msgpack.packb(message)
+
+
+def _json_batch(batch: List[Message]) -> str:
+    return "[" + ",".join(m.decode("utf-8") if isinstance(m, bytes) else m for m in batch) + "]"
+
+
+def _msgpack_batch(batch: List[bytes]) -> bytes:
+    return msgpack.Packer().pack_array_header(len(batch)) + b"".join(batch)
+
+
+class _Connection:
+    def __init__(self, websocket: WebSocket, queue_size: int, batch_window: float = 0.0, encoding: str = "json"):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.batch_window = batch_window
+        self.encoding = encoding
+
+
+class ConnectionManager:
+    def __init__(self, queue_size: int = WS_SEND_QUEUE_SIZE, policy: str = WS_SLOW_CONSUMER_POLICY):
+        if policy not in ("drop", "disconnect"):
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.queue_size = queue_size
+        self.policy = policy
+        # Keyed by WebSocket, so lookups and removals are O(1).
+        self.active_connections: Dict[WebSocket, _Connection] = {}
+
+    async def connect(self, websocket: WebSocket, batch_window: float = 0.0, encoding: str = "json"):
+        """Accepts a WebSocket and starts its writer.
+
+        A positive batch_window (seconds) coalesces messages into one frame per
+        window. Raises ValueError, before accepting, for an unusable encoding.
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding}")
+        if encoding == "msgpack" and msgpack is None:
+            raise ValueError("msgpack encoding is not available")
+        await websocket.accept()
+        connection = _Connection(websocket, self.queue_size, max(0.0, batch_window), encoding)
+        connection.writer = asyncio.create_task(self._write(connection))
+        self.active_connections[websocket] = connection
+        logger.debug(f"WebSocket connected: {websocket.client}")
+
+    def disconnect(self, websocket: WebSocket):
+        connection = self.active_connections.pop(websocket, None)
+        if connection is None:
+            return
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        logger.debug(f"WebSocket disconnected: {websocket.client}")
+
+    async def send_personal_message(self, message: Message, websocket: WebSocket):
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            self._enqueue(connection, _pack(message) if connection.encoding == "msgpack" else message)
+
+    async def broadcast(self, message: Message):
+        """Queues a message for every connection without waiting for any of them."""
+        packed = None
+        for connection in list(self.active_connections.values()):
+            if connection.encoding == "msgpack":
+                if packed is None:
+                    packed = _pack(message)
+                self._enqueue(connection, packed)
+            else:
+                self._enqueue(connection, message)
+
+    def _enqueue(self, connection: _Connection, message: Message):
+        if connection.queue.full():
+            if self.policy == "disconnect":
+                logger.warning(f"Disconnecting slow WebSocket consumer: {connection.websocket.client}")
+                self.disconnect(connection.websocket)
+                asyncio.create_task(self._close(connection.websocket, 1013, "Client too slow"))
+                return
+            connection.queue.get_nowait()
+            connection.dropped += 1
+            if connection.dropped == 1 or connection.dropped % 100 == 0:
+                logger.warning(f"Dropped {connection.dropped} messages for slow WebSocket consumer: {connection.websocket.client}")
+        connection.queue.put_nowait(message)
+
+    async def _write(self, connection: _Connection):
+        websocket = connection.websocket
+        try:
+            while True:
+                message = await connection.queue.get()
+                if connection.batch_window:
+                    message = await self._collect_batch(connection, message)
+                await asyncio.wait_for(self._send(websocket, message), WS_SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"WebSocket send to {websocket.client} failed: {e!r}")
+            self.disconnect(websocket)
+            await self._close(websocket, 1011, "Send failed")
+
+    @staticmethod
+    async def _collect_batch(connection: _Connection, first: Message) -> Message:
+        """Waits out the batch window and encodes everything queued by then as one frame."""
+        await asyncio.sleep(connection.batch_window)
+        batch = [first]
+        while len(batch) < WS_BATCH_MAX_MESSAGES and not connection.queue.empty():
+            batch.append(connection.queue.get_nowait())
+        if connection.encoding == "msgpack":
+            return _msgpack_batch(batch)
+        return _json_batch(batch)
+
+    @staticmethod
+    async def _send(websocket: WebSocket, message: Message):
+        if isinstance(message, bytes):
+            await websocket.send_bytes(message)
+        else:
+            await websocket.send_text(message)
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int, reason: str):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
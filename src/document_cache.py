@@ -0,0 +1,250 @@
+"""
+Two-tier, content-addressed cache of extracted document text.
+
+Documents are looked up by canonical URL. A URL record points at the SHA-256 of
+the downloaded bytes together with the validators (ETag / Last-Modified) needed
+for conditional GETs, and the extracted text is stored once per content hash, so
+the same PDF served from several URLs is only parsed once.
+
+- Tier 1 is an in-process LRU bounded by DOC_CACHE_MEMORY_BYTES.
+- Tier 2 lives in Redis and is shared by every API and worker process. Its text
+  entries are bounded by DOC_CACHE_REDIS_BYTES and evicted least-recently-used.
+
+Entries younger than DOC_CACHE_FRESH_SECONDS are served without any network
+traffic; older ones are revalidated by the caller with a conditional GET.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import redis
+
+from redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+DOC_CACHE_MEMORY_BYTES = int(os.getenv("DOC_CACHE_MEMORY_BYTES", 64 * 1024 * 1024))
+DOC_CACHE_REDIS_BYTES = int(os.getenv("DOC_CACHE_REDIS_BYTES", 512 * 1024 * 1024))
+DOC_CACHE_FRESH_SECONDS = int(os.getenv("DOC_CACHE_FRESH_SECONDS", 24 * 3600))
+DOC_CACHE_URL_TTL_SECONDS = int(os.getenv("DOC_CACHE_URL_TTL_SECONDS", 30 * 24 * 3600))
+
+_URL_KEY_PREFIX = "doc:url:"
+_TEXT_KEY_PREFIX = "doc:text:"
+_LRU_KEY = "doc:lru"
+_BYTES_KEY = "doc:bytes"
+_MEMORY_URL_RECORDS = 10000
+
+_TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+# Number of least recently used texts considered per eviction round.
+_EVICT_BATCH = 32
+
+# Stores the text under its content hash (counted once) and records the URL.
+# Returns the bytes now used, so the caller can evict if the budget is exceeded.
+_STORE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[2], 'NX') then
+  redis.call('INCRBY', KEYS[3], string.len(ARGV[2]))
+end
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+redis.call('HSET', KEYS[4], 'content_hash', ARGV[1], 'etag', ARGV[4], 'last_modified', ARGV[5], 'fetched_at', ARGV[3])
+redis.call('EXPIRE', KEYS[4], ARGV[6])
+return tonumber(redis.call('GET', KEYS[3]) or '0')
+"""
+
+
+def canonical_url(url: str) -> str:
+    """Normalizes a URL so trivially different spellings share one cache entry."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class CachedDocument(NamedTuple):
+    url: str
+    content_hash: str
+    text: str
+    etag: str
+    last_modified: str
+    fetched_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.fetched_at < DOC_CACHE_FRESH_SECONDS
+
+
+class DocumentCache:
+    def __init__(self, client=None, memory_bytes: int = DOC_CACHE_MEMORY_BYTES, redis_bytes: int = DOC_CACHE_REDIS_BYTES):
+        self._client = client or redis_client
+        self.memory_bytes = memory_bytes
+        self.redis_bytes = redis_bytes
+        self._lock = threading.Lock()
+        self._texts = OrderedDict()   # content hash -> text
+        self._urls = OrderedDict()    # canonical URL -> (content hash, etag, last modified, fetched at)
+        self._text_bytes = 0
+        self._store_script = None
+
+    @property
+    def _redis(self):
+        return self._client.get_client()
+
+    def lookup(self, url: str) -> Optional[CachedDocument]:
+        """Returns the cached document for a URL, or None if neither tier has it."""
+        canonical = canonical_url(url)
+        with self._lock:
+            record = self._urls.get(canonical)
+            if record:
+                self._urls.move_to_end(canonical)
+        if record is None:
+            record = self._lookup_redis_record(canonical)
+            if record is None:
+                return None
+        text = self.text_for(record[0])
+        if text is None:
+            return None
+        with self._lock:
+            self._remember_url(canonical, record)
+        return CachedDocument(canonical, record[0], text, record[1], record[2], record[3])
+
+    def text_for(self, digest: str) -> Optional[str]:
+        """Returns extracted text by content hash, e.g. for the same PDF under another URL."""
+        with self._lock:
+            text = self._texts.get(digest)
+            if text is not None:
+                self._texts.move_to_end(digest)
+                return text
+        if self._redis is None:
+            return None
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.get(_TEXT_KEY_PREFIX + digest)
+            pipe.zadd(_LRU_KEY, {digest: time.time()}, xx=True)
+            text, _ = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Document cache read failed: {e}")
+            return None
+        if text is not None:
+            with self._lock:
+                self._remember_text(digest, text)
+        return text
+
+    def store(self, url: str, digest: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Caches extracted text under its content hash and points the URL at it."""
+        canonical = canonical_url(url)
+        record = (digest, etag or "", last_modified or "", time.time())
+        with self._lock:
+            self._remember_text(digest, text)
+            self._remember_url(canonical, record)
+        if self._redis is None:
+            return
+        try:
+            if self._store_script is None:
+                self._store_script = self._redis.register_script(_STORE_SCRIPT)
+            used = self._store_script(
+                keys=[_TEXT_KEY_PREFIX + digest, _LRU_KEY, _BYTES_KEY, self._url_key(canonical)],
+                args=[digest, text, record[3], record[1], record[2], DOC_CACHE_URL_TTL_SECONDS],
+            )
+            if used > self.redis_bytes:
+                self._evict(keep=digest)
+        except Exception as e:
+            logger.warning(f"Document cache write failed: {e}")
+
+    def _evict(self, keep: str):
+        """
+        Deletes least recently used texts from Redis until the byte budget is respected.
+
+        Each round reads the oldest entries and their sizes, then removes them in
+        one transaction guarded by WATCH, so a concurrent eviction or read cannot
+        make the byte counter drift. A round that loses that race ends eviction;
+        the next store picks it up again.
+        """
+        while True:
+            with self._redis.pipeline() as pipe:
+                try:
+                    pipe.watch(_LRU_KEY, _BYTES_KEY)
+                    used = int(pipe.get(_BYTES_KEY) or 0)
+                    oldest = [digest for digest in pipe.zrange(_LRU_KEY, 0, _EVICT_BATCH - 1) if digest != keep]
+                    if used <= self.redis_bytes or not oldest:
+                        return
+                    sizes = self._redis.pipeline(transaction=False)
+                    for digest in oldest:
+                        sizes.strlen(_TEXT_KEY_PREFIX + digest)
+                    victims, freed = [], 0
+                    for digest, size in zip(oldest, sizes.execute()):
+                        if used - freed <= self.redis_bytes:
+                            break
+                        victims.append(digest)
+                        freed += size
+                    pipe.multi()
+                    pipe.delete(*(_TEXT_KEY_PREFIX + digest for digest in victims))
+                    pipe.zrem(_LRU_KEY, *victims)
+                    pipe.decrby(_BYTES_KEY, freed)
+                    pipe.execute()
+                except redis.exceptions.WatchError:
+                    return
+
+    def touch(self, document: CachedDocument):
+        """Marks a document as revalidated (e.g. after a 304 Not Modified) without resending its text."""
+        now = time.time()
+        with self._lock:
+            self._remember_url(document.url, (document.content_hash, document.etag, document.last_modified, now))
+            if document.content_hash in self._texts:
+                self._texts.move_to_end(document.content_hash)
+        if self._redis is None:
+            return
+        try:
+            url_key = self._url_key(document.url)
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.hset(url_key, "fetched_at", now)
+            pipe.expire(url_key, DOC_CACHE_URL_TTL_SECONDS)
+            pipe.zadd(_LRU_KEY, {document.content_hash: now}, xx=True)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Document cache write failed: {e}")
+
+    def _lookup_redis_record(self, canonical: str):
+        if self._redis is None:
+            return None
+        try:
+            fields = self._redis.hgetall(self._url_key(canonical))
+        except Exception as e:
+            logger.warning(f"Document cache read failed: {e}")
+            return None
+        if not fields or not fields.get("content_hash"):
+            return None
+        return (fields["content_hash"], fields.get("etag", ""), fields.get("last_modified", ""), float(fields.get("fetched_at", 0)))
+
+    def _remember_text(self, digest: str, text: str):
+        if digest in self._texts:
+            self._texts.move_to_end(digest)
+            return
+        self._texts[digest] = text
+        self._text_bytes += len(text)
+        while self._text_bytes > self.memory_bytes and len(self._texts) > 1:
+            _, evicted = self._texts.popitem(last=False)
+            self._text_bytes -= len(evicted)
+
+    def _remember_url(self, canonical: str, record):
+        self._urls[canonical] = record
+        self._urls.move_to_end(canonical)
+        while len(self._urls) > _MEMORY_URL_RECORDS:
+            self._urls.popitem(last=False)
+
+    @staticmethod
+    def _url_key(canonical: str) -> str:
+        return _URL_KEY_PREFIX + hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+document_cache = DocumentCache()
@@ -4,9 +4,8 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Body, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Body, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
 import os
 import asyncio
 from fastapi.staticfiles import StaticFiles
@@ -15,8 +14,18 @@ from starlette.responses import FileResponse
 # Ensure environment is loaded early
 import config
 
-from agents.coordinator.agent import decompose_and_dispatch, process_voice_input
-from redis_client import redis_client
+from agents.coordinator.agent import (
+    decompose_and_dispatch,
+    decompose_and_dispatch_batch,
+    decomposition_engine,
+    process_voice_input,
+)
+from redis_client import async_redis_client, StreamTaskQueue
+from activity_stream import activity_stream, events_manager
+from connection_manager import ConnectionManager
+from paper_index import search_papers_index
+from paper_store import PAPER_LIST_FIELDS, list_papers
+from term_sketch import top_terms
 from voice_handler import VoiceHandler
 import json
 
@@ -51,23 +60,48 @@ async def log_requests(request: Request, call_next):
     return response
 
 # Background worker for voice tasks
+VOICE_TASK_QUEUE = "tasks:coordinator_voice_input"
+VOICE_TASK_BATCH_SIZE = int(os.getenv("VOICE_TASK_BATCH_SIZE", 10))
+VOICE_TASK_BLOCK_SECONDS = int(os.getenv("VOICE_TASK_BLOCK_SECONDS", 5))
+DECOMPOSE_BATCH_MAX_QUERIES = int(os.getenv("DECOMPOSE_BATCH_MAX_QUERIES", 1000))
+PAPERS_PAGE_MAX = int(os.getenv("PAPERS_PAGE_MAX", 200))
+WS_BATCH_MAX_WINDOW_MS = int(os.getenv("WS_BATCH_MAX_WINDOW_MS", 1000))
+
+async def handle_voice_task(task_json: str):
+    logger.info(f"Processing voice task: {task_json}")
+    task = json.loads(task_json)
+    payload = task.get("payload", {})
+    query = payload.get("query")
+    session_id = payload.get("session_id")
+    response_channel = payload.get("response_channel")
+
+    if query and session_id and response_channel:
+        await process_voice_input(query, session_id, response_channel)
+
 async def voice_task_worker():
     logger.info("Starting voice task worker")
+    queue = StreamTaskQueue(VOICE_TASK_QUEUE, "coordinator", legacy_list=VOICE_TASK_QUEUE)
+    while True:
+        try:
+            await queue.ensure_group()
+            break
+        except Exception as e:
+            logger.error(f"Could not create voice task consumer group: {e}")
+            await asyncio.sleep(1)
+
+    async def run(task):
+        try:
+            await handle_voice_task(task.data)
+            await queue.ack(task)
+        except Exception as e:
+            logger.error(f"Error processing voice task {task.message_id}: {e}")
+            await queue.fail(task, str(e))
+
     while True:
         try:
-            task_json = redis_client.pop_task("tasks:coordinator_voice_input")
-            if task_json:
-                logger.info(f"Processing voice task: {task_json}")
-                task = json.loads(task_json)
-                payload = task.get("payload", {})
-                query = payload.get("query")
-                session_id = payload.get("session_id")
-                response_channel = payload.get("response_channel")
-                
-                if query and session_id and response_channel:
-                    await process_voice_input(query, session_id, response_channel)
-            else:
-                await asyncio.sleep(0.1)
+            # XREADGROUP blocks until tasks arrive and returns up to a batch of them at once.
+            batch = await queue.read(count=VOICE_TASK_BATCH_SIZE, block_ms=VOICE_TASK_BLOCK_SECONDS * 1000)
+            await asyncio.gather(*(run(task) for task in batch))
         except Exception as e:
             logger.error(f"Error in voice task worker: {e}")
             await asyncio.sleep(1)
@@ -75,6 +109,14 @@ async def voice_task_worker():
 @app.on_event("startup")
 async def startup_event():
     asyncio.create_task(voice_task_worker())
+    activity_stream.start()
+    # Build the DSPy LM and decomposition program in the background so the first request doesn't pay for it
+    asyncio.create_task(asyncio.to_thread(decomposition_engine.warm))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await activity_stream.stop()
+    await async_redis_client.close()
 
 # Add CORS middleware for frontend
 app.add_middleware(
@@ -87,27 +129,6 @@ app.add_middleware(
 )
 
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"WebSocket connected: {websocket.client}")
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        logger.info(f"WebSocket disconnected: {websocket.client}")
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
-
-
 manager = ConnectionManager()
 
 
@@ -129,19 +150,63 @@ async def api_decompose(payload: dict = Body(...)):
     session_id = payload.get("session_id")
     logger.info(f"Decompose API called with query: {query}, session_id: {session_id}")
 
-    task_ids = decompose_and_dispatch(query, session_id=session_id)
+    # decompose_and_dispatch is a blocking ADK FunctionTool; keep it off the event loop.
+    task_ids = await asyncio.to_thread(decompose_and_dispatch, query, session_id=session_id)
     return {"tasks": task_ids}
 
 
+@app.post("/api/decompose/batch")
+async def api_decompose_batch(payload: dict = Body(...)):
+    """Decomposes many queries at once.
+
+    Accepts {"queries": ["...", {"query": "...", "session_id": "..."}], "session_id": "..."}
+    where a top-level session_id applies to plain-string queries. Returns the task
+    IDs for each query in request order.
+    """
+    default_session_id = payload.get("session_id")
+    requests = []
+    for item in payload.get("queries") or []:
+        if isinstance(item, dict):
+            requests.append((item.get("query"), item.get("session_id", default_session_id)))
+        else:
+            requests.append((item, default_session_id))
+    if not requests or not all(isinstance(query, str) and query.strip() for query, _ in requests):
+        raise HTTPException(status_code=400, detail="queries must be a non-empty list of query strings")
+    if len(requests) > DECOMPOSE_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {DECOMPOSE_BATCH_MAX_QUERIES} queries per batch")
+    logger.info(f"Batch decompose API called with {len(requests)} queries")
+
+    dispatched = await asyncio.to_thread(decompose_and_dispatch_batch, requests)
+    return {"results": [{"query": query, "tasks": task_ids} for (query, _), task_ids in zip(requests, dispatched)]}
+
+
 @app.get("/api/papers")
-async def get_papers():
+async def get_papers(limit: int = 20, cursor: str | None = None, fields: str = "title,url"):
+    """Lists papers newest first. Pass the returned next_cursor to fetch the following page."""
     logger.info("Get papers endpoint called")
-    keys = redis_client.client.keys("paper:*")[:20]
-    papers = []
-    for k in keys:
-        p = redis_client.get_all_hash_fields(k)
-        papers.append({"title": p.get("title", ""), "url": p.get("url", ""), "id": k})
-    return {"papers": papers}
+    requested = [f for f in fields.split(",") if f]
+    if not requested or any(f not in PAPER_LIST_FIELDS for f in requested):
+        raise HTTPException(status_code=400, detail=f"fields must be a subset of {','.join(PAPER_LIST_FIELDS)}")
+    limit = max(1, min(limit, PAPERS_PAGE_MAX))
+    try:
+        papers, next_cursor = await list_papers(limit, cursor=cursor, fields=requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"papers": papers, "next_cursor": next_cursor}
+
+
+@app.get("/api/papers/search")
+async def search_papers(q: str, limit: int = 10):
+    """Full-text search over the stored papers, ranked by BM25."""
+    logger.info(f"Paper search called with q: {q}")
+    limit = max(1, min(limit, PAPERS_PAGE_MAX))
+    return {"papers": await search_papers_index(q, limit)}
+
+
+@app.get("/api/terms/top")
+async def get_top_terms(k: int = 20):
+    """Approximate most frequent terms across every ingested paper, with Count-Min error bounds."""
+    return await top_terms(k)
 
 
 @app.websocket("/ws/{client_id}")
@@ -174,32 +239,32 @@ async def websocket_live_endpoint(websocket: WebSocket):
 
 
 @app.websocket("/ws/events")
-async def websocket_events_endpoint(websocket: WebSocket):
-    logger.info("New connection attempt to /ws/events")
-    await websocket.accept()
-    logger.info("Connection accepted for /ws/events")
-    pubsub = None
+async def websocket_events_endpoint(websocket: WebSocket, batch_ms: int = 0, encoding: str = "json"):
+    """Streams agent activity events.
+
+    By default every event is its own JSON text frame. With batch_ms > 0, events
+    arriving within that many milliseconds are sent together as one frame holding
+    an array of events; encoding=msgpack sends binary MessagePack frames instead.
+    """
+    logger.debug("New connection attempt to /ws/events")
+    # Events arrive from the process-wide agent:activity subscription via the events manager.
+    batch_window = min(max(batch_ms, 0), WS_BATCH_MAX_WINDOW_MS) / 1000
     try:
-        pubsub = redis_client.subscribe_to_channel("agent:activity")
-        if not pubsub:
-            logger.error("Could not connect to Redis Pub/Sub")
-            await websocket.close(code=1011, reason="Could not connect to Redis Pub/Sub.")
-            return
-
+        await events_manager.connect(websocket, batch_window=batch_window, encoding=encoding)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    logger.debug("Connection accepted for /ws/events")
+    try:
+        # Clients do not send anything; receiving only detects the disconnect promptly.
         while True:
-            # Check for new message without blocking
-            message = pubsub.get_message(ignore_subscribe_messages=True)
-            if message and 'data' in message:
-                logger.info(f"Broadcasting event: {message['data']}")
-                await websocket.send_text(message['data'])
-            await asyncio.sleep(0.1)  # Prevent busy-waiting
+            await websocket.receive_text()
     except WebSocketDisconnect:
-        logger.info("WebSocket disconnected from /ws/events")
+        logger.debug("WebSocket disconnected from /ws/events")
     except Exception as e:
         logger.error(f"WebSocket error in /ws/events: {e}")
     finally:
-        if pubsub:
-            pubsub.close()
+        events_manager.disconnect(websocket)
 
 
 # ==============================================================================
@@ -1,9 +1,67 @@
 import asyncio
+import atexit
+import hashlib
+import json
+import logging
 import os
+import re
+import threading
 from contextlib import asynccontextmanager
+from datetime import timedelta
 from mcp.client.session import ClientSession
 from mcp.client.stdio import StdioServerParameters, stdio_client
-from mcp.types import CallToolRequest
+
+from redis_client import async_redis_client
+from singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+TAVILY_MCP_CALL_TIMEOUT = timedelta(seconds=float(os.getenv("TAVILY_MCP_CALL_TIMEOUT_SECONDS", 30)))
+TAVILY_SEARCH_CACHE_TTL_SECONDS = int(os.getenv("TAVILY_SEARCH_CACHE_TTL_SECONDS", 6 * 3600))
+SEARCH_CACHE_KEY_PREFIX = "search:cache:"
+SEARCH_CACHE_STATS_KEY = "search:cache:stats"
+
+# Reads a cached search result and counts the hit or miss in the same round trip.
+_CACHE_GET_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+redis.call('HINCRBY', KEYS[2], value and 'hits' or 'misses', 1)
+return value
+"""
+
+# Identical searches issued at the same moment by different tasks or workers share one MCP call.
+_search_flight = AsyncSingleFlight("search", lease_seconds=TAVILY_MCP_CALL_TIMEOUT.total_seconds() + 5)
+
+def normalize_query(query: str) -> str:
+    """Lowercases a query and strips punctuation noise so equivalent queries share a cache entry."""
+    return " ".join(re.sub(r"[^\w\s:./-]", " ", query.lower()).split())
+
+def search_cache_key(query: str, **kwargs) -> str:
+    payload = json.dumps({"query": normalize_query(query), **kwargs}, sort_keys=True, default=str)
+    return SEARCH_CACHE_KEY_PREFIX + hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+async def _cache_get(cache_key: str):
+    try:
+        script = async_redis_client.client.register_script(_CACHE_GET_SCRIPT)
+        raw = await script(keys=[cache_key, SEARCH_CACHE_STATS_KEY])
+        return json.loads(raw) if raw else None
+    except Exception as e:
+        logger.warning(f"Search cache read failed: {e}")
+        return None
+
+async def _cache_peek(cache_key: str):
+    """Reads a cached result without counting it, for callers waiting on another worker."""
+    try:
+        raw = await async_redis_client.get(cache_key)
+        return json.loads(raw) if raw else None
+    except Exception as e:
+        logger.warning(f"Search cache read failed: {e}")
+        return None
+
+async def _cache_put(cache_key: str, result: dict):
+    try:
+        await async_redis_client.set_with_ttl(cache_key, json.dumps(result), TAVILY_SEARCH_CACHE_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Search cache write failed: {e}")
 
 class TavilyMCPClient:
     """
@@ -16,24 +74,59 @@ class TavilyMCPClient:
             env=os.environ.copy(),
         )
         self._session = None
-        self._client_context = None
+        self._runner = None
+        self._closing = None
+
+    @property
+    def connected(self) -> bool:
+        return self._session is not None
 
     async def connect(self):
-        """Initializes the connection to the MCP server."""
-        if not self._session:
-            self._client_context = stdio_client(self.server_params)
-            read, write = await self._client_context.__aenter__()
-            self._session = ClientSession(read, write)
-            await self._session.initialize()
+        """Starts the MCP server process and completes the initialize handshake."""
+        if not self._runner:
+            ready = asyncio.get_running_loop().create_future()
+            self._closing = asyncio.Event()
+            self._runner = asyncio.create_task(self._run(ready))
+            try:
+                await ready
+            except BaseException:
+                self._runner = None
+                raise
+
+    async def _run(self, ready: asyncio.Future):
+        # stdio_client and ClientSession are anyio contexts that must be entered and
+        # exited by the same task, so one task owns them for the client's lifetime
+        # while other tasks issue requests over the shared session.
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self._session = session
+                    ready.set_result(None)
+                    await self._closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.warning(f"Tavily MCP session ended unexpectedly: {e}")
+        finally:
+            self._session = None
 
     async def close(self):
         """Closes the connection to the MCP server."""
-        if self._session:
-            await self._session.close()
-            self._session = None
-        if self._client_context:
-            await self._client_context.__aexit__(None, None, None)
-            self._client_context = None
+        if self._runner:
+            self._closing.set()
+            try:
+                await self._runner
+            except Exception as e:
+                logger.warning(f"Error closing Tavily MCP session: {e}")
+            self._runner = None
+
+    async def ping(self):
+        """Round-trips an MCP ping to verify the server process is responsive."""
+        if not self._session:
+            raise ConnectionError("Tavily MCP session is not connected")
+        await self._session.send_ping()
 
     async def search(self, query: str, **kwargs) -> dict:
         """
@@ -49,14 +142,12 @@ class TavilyMCPClient:
         if not self._session:
             await self.connect()
 
-        request = CallToolRequest(
-            params={
-                "name": "tavily-search",
-                "arguments": {"query": query, **kwargs},
-            }
+        result = await self._session.call_tool(
+            "tavily-search",
+            arguments={"query": query, **kwargs},
+            read_timeout_seconds=TAVILY_MCP_CALL_TIMEOUT,
         )
-        result = await self._session.call_tool(request)
-        
+
         # The result from the MCP server is a list of content blocks.
         # We need to parse the text content to get the search results.
         if result.content and hasattr(result.content[0], 'text'):
@@ -95,3 +186,165 @@ async def get_tavily_mcp_client():
         yield client
     finally:
         await client.close()
+
+
+class _PoolSlot:
+    def __init__(self, index: int):
+        self.index = index
+        self.client = None
+        self.in_flight = 0
+        self.lock = asyncio.Lock()
+
+    @property
+    def healthy(self) -> bool:
+        return self.client is not None and self.client.connected
+
+
+class TavilyMCPPool:
+    """
+    A process-wide pool of warm TavilyMCPClient sessions.
+
+    Each slot keeps one Node server process with an initialized MCP session, and
+    concurrent searches are multiplexed over the least-loaded healthy slot. The
+    sessions live on a dedicated background event loop, so callers on any loop
+    (uvicorn, worker processes, `asyncio.run` inside FunctionTools) or on plain
+    threads share the same processes. Idle sessions are pinged periodically and
+    respawned when they stop answering.
+
+    The following environment variables are used for configuration:
+    - TAVILY_MCP_POOL_SIZE: Number of server processes to keep warm (default: 2).
+    - TAVILY_MCP_HEALTH_CHECK_SECONDS: Interval between health checks (default: 30).
+    """
+    def __init__(self, size: int | None = None, health_check_interval: float | None = None):
+        self.size = size or int(os.getenv("TAVILY_MCP_POOL_SIZE", 2))
+        self.health_check_interval = health_check_interval or float(os.getenv("TAVILY_MCP_HEALTH_CHECK_SECONDS", 30))
+        self._slots = [_PoolSlot(i) for i in range(self.size)]
+        self._loop = None
+        self._thread = None
+        self._health_task = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="tavily-mcp-pool", daemon=True)
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self._start(), self._loop)
+        return self._loop
+
+    async def search(self, query: str, **kwargs) -> dict:
+        """Runs a tavily-search on the least-loaded pooled session.
+
+        Results are cached in Redis per normalized query for
+        TAVILY_SEARCH_CACHE_TTL_SECONDS and shared by every worker, and concurrent
+        identical searches are coalesced into a single call. Cache hits are served
+        without touching the MCP sessions, so they do not wait for a server to start.
+        """
+        cache_key = search_cache_key(query, **kwargs)
+        cached = await _cache_get(cache_key)
+        if cached is not None:
+            return cached
+        return await _search_flight.do(
+            cache_key,
+            lambda: self._search_uncached(cache_key, query, **kwargs),
+            lookup=lambda: _cache_peek(cache_key),
+        )
+
+    async def _search_uncached(self, cache_key: str, query: str, **kwargs) -> dict:
+        future = asyncio.run_coroutine_threadsafe(self._search(query, **kwargs), self._ensure_loop())
+        result = await asyncio.wrap_future(future)
+        if result["results"]:
+            await _cache_put(cache_key, result)
+        return result
+
+    def shutdown(self, timeout: float = 10):
+        """Closes every pooled session and stops the background loop."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Error shutting down Tavily MCP pool: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def _start(self):
+        self._health_task = asyncio.create_task(self._health_check_loop())
+        await asyncio.gather(*(self._respawn(slot) for slot in self._slots), return_exceptions=True)
+
+    async def _stop(self):
+        if self._health_task:
+            self._health_task.cancel()
+        for slot in self._slots:
+            if slot.client:
+                await slot.client.close()
+                slot.client = None
+
+    async def _search(self, query: str, **kwargs) -> dict:
+        slot = self._least_loaded()
+        slot.in_flight += 1
+        try:
+            if not slot.healthy:
+                await self._respawn(slot)
+            try:
+                return await slot.client.search(query, **kwargs)
+            except Exception:
+                # Only a failed search on a live session warrants a restart; a failed respawn above propagates as is.
+                if not await self._check(slot):
+                    await self._respawn(slot)
+                raise
+        finally:
+            slot.in_flight -= 1
+
+    def _least_loaded(self) -> _PoolSlot:
+        healthy = [slot for slot in self._slots if slot.healthy]
+        return min(healthy or self._slots, key=lambda slot: slot.in_flight)
+
+    async def _check(self, slot: _PoolSlot) -> bool:
+        if not slot.healthy:
+            return False
+        try:
+            await asyncio.wait_for(slot.client.ping(), timeout=5)
+            return True
+        except Exception as e:
+            logger.warning(f"Tavily MCP session {slot.index} failed its health check: {e}")
+            return False
+
+    async def _respawn(self, slot: _PoolSlot):
+        async with slot.lock:
+            if slot.healthy and await self._check(slot):
+                return
+            if slot.client:
+                await slot.client.close()
+            slot.client = TavilyMCPClient()
+            try:
+                await slot.client.connect()
+                logger.info(f"Tavily MCP session {slot.index} started")
+            except Exception as e:
+                logger.error(f"Could not start Tavily MCP session {slot.index}: {e}")
+                raise
+
+    async def _health_check_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for slot in self._slots:
+                if slot.in_flight == 0 and not await self._check(slot):
+                    try:
+                        await self._respawn(slot)
+                    except Exception:
+                        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_tavily_mcp_pool() -> TavilyMCPPool:
+    """Returns the process-wide TavilyMCPPool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TavilyMCPPool()
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -0,0 +1,94 @@
+"""
+Full-text inverted index over stored papers, with BM25 ranking.
+
+The index is maintained incrementally as papers are ingested and lives in Redis
+next to the papers, so every API and worker process shares it:
+
+- idx:term:{term}  hash of paper ID -> term frequency (the term's postings;
+                   small hashes are stored by Redis as compact listpacks)
+- idx:doclen       hash of paper ID -> number of terms in the paper
+- idx:stats        hash with the number of indexed papers (docs) and their
+                   total length (total_len), for BM25's length normalization
+"""
+import heapq
+import math
+from collections import Counter
+from typing import List
+
+from paper_store import paper_key
+from redis_client import async_redis_client
+from text_terms import tokenize
+
+TERM_KEY_PREFIX = "idx:term:"
+DOCLEN_KEY = "idx:doclen"
+STATS_KEY = "idx:stats"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Records a paper's length unless it is already indexed and, only then, counts
+# it in the corpus stats; returns 1 if it was added.
+_ADD_DOC_SCRIPT = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+  return 0
+end
+redis.call('HINCRBY', KEYS[2], 'docs', 1)
+redis.call('HINCRBY', KEYS[2], 'total_len', ARGV[2])
+return 1
+"""
+
+
+async def index_paper(paper_id: str, counts: Counter) -> bool:
+    """Adds a paper's term counts to the index in one round trip; papers already indexed are left alone.
+
+    Writing a posting is idempotent, so postings are always written and only the
+    document length and corpus stats are guarded against double counting.
+    """
+    client = async_redis_client.client
+    pipe = client.pipeline(transaction=False)
+    for term, count in counts.items():
+        pipe.hset(TERM_KEY_PREFIX + term, paper_id, count)
+    script = client.register_script(_ADD_DOC_SCRIPT)
+    await script(keys=[DOCLEN_KEY, STATS_KEY], args=[paper_id, sum(counts.values())], client=pipe)
+    results = await pipe.execute()
+    return bool(results[-1])
+
+
+async def search_papers_index(query: str, limit: int = 10) -> List[dict]:
+    """Returns the stored papers that best match a query, ranked by BM25."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.hmget(STATS_KEY, "docs", "total_len")
+    for term in terms:
+        pipe.hgetall(TERM_KEY_PREFIX + term)
+    (docs, total_len), *postings = await pipe.execute()
+    docs = int(docs or 0)
+    if not docs:
+        return []
+    avg_len = int(total_len or 0) / docs
+
+    candidates = list({paper_id for posting in postings for paper_id in posting})
+    if not candidates:
+        return []
+    lengths = dict(zip(candidates, await async_redis_client.client.hmget(DOCLEN_KEY, candidates)))
+
+    scores = dict.fromkeys(candidates, 0.0)
+    for posting in postings:
+        if not posting:
+            continue
+        idf = math.log(1 + (docs - len(posting) + 0.5) / (len(posting) + 0.5))
+        for paper_id, tf in posting.items():
+            tf = int(tf)
+            norm = 1 - BM25_B + BM25_B * int(lengths[paper_id] or 0) / max(avg_len, 1.0)
+            scores[paper_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+    top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+    pipe = async_redis_client.pipeline(transaction=False)
+    for paper_id, _ in top:
+        pipe.hmget(paper_key(paper_id), "title", "url")
+    return [
+        {"id": paper_key(paper_id), "title": title or "", "url": url or "", "score": round(score, 4)}
+        for (paper_id, score), (title, url) in zip(top, await pipe.execute())
+    ]
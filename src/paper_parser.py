@@ -1,91 +1,188 @@
-import io
-import requests
-from typing import Optional
-from PyPDF2 import PdfReader
-
-
-def download_pdf(url: str) -> Optional[bytes]:
-	"""Try to download pdf from a URL. Returns bytes or None."""
-	try:
-		resp = requests.get(url, timeout=15)
-		resp.raise_for_status()
-		content_type = resp.headers.get("Content-Type", "")
-		if "pdf" in content_type or url.endswith(".pdf"):
-			return resp.content
-	except Exception:
-		return None
-	return None
-
-
-import io
+import hashlib
+import logging
 import os
+import tempfile
 import requests
 from typing import Optional
 from urllib.parse import urlparse
-from PyPDF2 import PdfReader
+
+from document_cache import canonical_url, document_cache
+from pdf_extraction import PDF_EXTRACT_TIMEOUT_SECONDS, PdfExtractionTimeout, PdfSource, extract_pdf_text
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+PDF_MAX_DOWNLOAD_BYTES = int(os.getenv("PDF_MAX_DOWNLOAD_BYTES", 50 * 1024 * 1024))
+HTML_MAX_DOWNLOAD_BYTES = int(os.getenv("HTML_MAX_DOWNLOAD_BYTES", 2 * 1024 * 1024))
+# Bodies larger than this are spooled to a temp file instead of being held in memory.
+DOWNLOAD_SPOOL_BYTES = int(os.getenv("DOWNLOAD_SPOOL_BYTES", 1024 * 1024))
+_CHUNK_BYTES = 64 * 1024
+_SNIFF_BYTES = 1024
+
+# Concurrent fetches of the same document, in this process or another worker, share one download.
+_fetch_flight = SingleFlight("fetch", lease_seconds=PDF_EXTRACT_TIMEOUT_SECONDS + 30)
+
+
+class _DownloadBody:
+    """A streamed, size-capped response body, hashed as it arrives.
+
+    Small bodies stay in memory; larger ones are spooled to a named temp file so
+    the PDF extraction workers can open them directly instead of receiving a copy.
+    """
+    def __init__(self, spool_bytes: int = DOWNLOAD_SPOOL_BYTES):
+        self.spool_bytes = spool_bytes
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self._buffer = bytearray()
+        self._file = None
+
+    def write(self, chunk: bytes):
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+        if len(self.head) < _SNIFF_BYTES:
+            self.head = (self.head + chunk)[:_SNIFF_BYTES]
+        if self._file is None and self.size > self.spool_bytes:
+            self._file = tempfile.NamedTemporaryFile(prefix="argos-download-", delete=False)
+            self._file.write(self._buffer)
+            self._buffer = bytearray()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer += chunk
+
+    @property
+    def looks_like_pdf(self) -> bool:
+        return self.head.lstrip().startswith(b"%PDF")
+
+    def pdf_source(self) -> PdfSource:
+        if self._file is not None:
+            self._file.flush()
+            return self._file.name
+        return bytes(self._buffer)
+
+    def read_bytes(self) -> bytes:
+        if self._file is not None:
+            self._file.flush()
+            with open(self._file.name, "rb") as fh:
+                return fh.read()
+        return bytes(self._buffer)
+
+    def text(self, encoding: Optional[str]) -> str:
+        return self.read_bytes().decode(encoding or "utf-8", errors="replace")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self._file.name)
+            self._file = None
+
+
+def _read_body(resp: requests.Response, max_bytes: int) -> Optional[_DownloadBody]:
+    """Streams a response into a _DownloadBody, or returns None if it exceeds max_bytes."""
+    declared = resp.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        logger.warning(f"Skipping {resp.url}: Content-Length {declared} exceeds {max_bytes} bytes")
+        return None
+    body = _DownloadBody()
+    for chunk in resp.iter_content(chunk_size=_CHUNK_BYTES):
+        body.write(chunk)
+        if body.size > max_bytes:
+            logger.warning(f"Skipping {resp.url}: body exceeds {max_bytes} bytes")
+            body.close()
+            return None
+    return body
 
 
 def download_pdf(url: str) -> Optional[bytes]:
-	"""Try to download pdf from a URL. Returns bytes or None."""
-	try:
-		resp = requests.get(url, timeout=15)
-		resp.raise_for_status()
-		content_type = resp.headers.get("Content-Type", "")
-		if "pdf" in content_type or url.endswith(".pdf"):
-			return resp.content
-	except Exception:
-		return None
-	return None
+    """Try to download pdf from a URL. Returns bytes or None."""
+    try:
+        with requests.get(url, timeout=15, stream=True) as resp:
+            resp.raise_for_status()
+            content_type = resp.headers.get("Content-Type", "")
+            if "pdf" in content_type or url.endswith(".pdf"):
+                body = _read_body(resp, PDF_MAX_DOWNLOAD_BYTES)
+                if body is None:
+                    return None
+                try:
+                    return body.read_bytes()
+                finally:
+                    body.close()
+    except Exception:
+        return None
+    return None
+
+
+def _pdf_text(source: PdfSource) -> str:
+    """Extracts PDF text, settling for the pages that finished if extraction times out."""
+    try:
+        return extract_pdf_text(source)
+    except PdfExtractionTimeout as e:
+        return e.text
 
 
 def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
-	"""Extract plain text from PDF bytes using PyPDF2. For POC we use a simple approach."""
-	with io.BytesIO(pdf_bytes) as fh:
-		reader = PdfReader(fh)
-		text_parts = []
-		for page in reader.pages:
-			try:
-				text_parts.append(page.extract_text() or "")
-			except Exception:
-				continue
-		return "\n\n".join(text_parts)
+    """Extract plain text from PDF bytes using PyPDF2 on the shared extraction process pool."""
+    return _pdf_text(pdf_bytes)
 
 
-def extract_text_from_url(url: str) -> Optional[str]:
-	"""Very small PDF/HTML extractor for POC.
-
-	- If the URL begins with file://, read local file
-	- If the URL is HTTP(S), try to download and parse PDF (or return page text)
-	"""
-	if not url:
-		return None
-
-	parsed = urlparse(url)
-	try:
-		if parsed.scheme == "file":
-			path = parsed.path
-			if os.path.exists(path):
-				if path.lower().endswith(".pdf"):
-					reader = PdfReader(path)
-					text = "\n".join([p.extract_text() or "" for p in reader.pages])
-					return text
-				else:
-					with open(path, "r", encoding="utf-8", errors="ignore") as f:
-						return f.read()
-
-			if parsed.scheme in ("http", "https"):
-				r = requests.get(url, timeout=10)
-				ctype = r.headers.get("Content-Type", "")
-				if "pdf" in ctype or url.lower().endswith(".pdf"):
-					reader = PdfReader(io.BytesIO(r.content))
-					text = "\n".join([p.extract_text() or "" for p in reader.pages])
-					return text
-				else:
-					# Return HTML as text fallback
-					return r.text
-	except Exception:
-		return None
-	return None
+def _extract_text_from_http(url: str) -> Optional[str]:
+    """Download and extract a document, going through the document cache.
+
+    Fresh cache entries are returned without touching the network. Stale ones are
+    revalidated with a conditional GET, and unchanged bodies (304) reuse the
+    cached text. Bodies already seen under another URL reuse their parsed text.
+    Downloads are streamed and capped, so peak memory does not grow with file size.
+    """
+    cached = document_cache.lookup(url)
+    if cached and cached.fresh:
+        return cached.text
+
+    headers = {}
+    if cached and cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached and cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+
+    with requests.get(url, timeout=10, headers=headers, stream=True) as r:
+        if cached and r.status_code == 304:
+            document_cache.touch(cached)
+            return cached.text
+
+        ctype = r.headers.get("Content-Type", "")
+        is_pdf = "pdf" in ctype or ("html" not in ctype and url.lower().endswith(".pdf"))
+        body = _read_body(r, PDF_MAX_DOWNLOAD_BYTES if is_pdf else HTML_MAX_DOWNLOAD_BYTES)
+        if body is None:
+            return None
+
+        try:
+            # Trust the bytes over the headers: an HTML page served as a PDF is not parsed as one.
+            is_pdf = is_pdf and body.looks_like_pdf
+            if not is_pdf and body.size > HTML_MAX_DOWNLOAD_BYTES:
+                return None
+
+            if r.status_code != 200:
+                # Error pages are returned as before but never cached
+                return _pdf_text(body.pdf_source()) if is_pdf else body.text(r.encoding)
+
+            digest = body.sha256.hexdigest()
+            text = document_cache.text_for(digest)
+            if text is None:
+                try:
+                    # Return HTML as text fallback
+                    text = extract_pdf_text(body.pdf_source()) if is_pdf else body.text(r.encoding)
+                except PdfExtractionTimeout as e:
+                    # Partial text is returned but never cached, so a later fetch can extract it in full.
+                    return e.text
+            document_cache.store(url, digest, text, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+            return text
+        finally:
+            body.close()
+
+
+def _fresh_cached_text(url: str) -> Optional[str]:
+    cached = document_cache.lookup(url)
+    return cached.text if cached and cached.fresh else None
 
 
 def extract_text_from_url(url: str) -> Optional[str]:
@@ -103,24 +200,18 @@ def extract_text_from_url(url: str) -> Optional[str]:
             path = parsed.path
             if os.path.exists(path):
                 if path.lower().endswith(".pdf"):
-                    reader = PdfReader(path)
-                    text = "\n".join([p.extract_text() or "" for p in reader.pages])
-                    return text
+                    return _pdf_text(path)
                 else:
                     with open(path, "r", encoding="utf-8", errors="ignore") as f:
                         return f.read()
 
         if parsed.scheme in ("http", "https"):
-            r = requests.get(url, timeout=10)
-            ctype = r.headers.get("Content-Type", "")
-            if "pdf" in ctype or url.lower().endswith(".pdf"):
-                reader = PdfReader(io.BytesIO(r.content))
-                text = "\n".join([p.extract_text() or "" for p in reader.pages])
-                return text
-            else:
-                # Return HTML as text fallback
-                return r.text
+            key = hashlib.sha1(canonical_url(url).encode("utf-8")).hexdigest()
+            return _fetch_flight.do(
+                key,
+                lambda: _extract_text_from_http(url),
+                lookup=lambda: _fresh_cached_text(url),
+            )
     except Exception:
         return None
     return None
-
@@ -0,0 +1,154 @@
+"""
+Storage of parsed papers in Redis.
+
+A paper's ID is derived from its canonical URL, so the same paper found by
+different queries (or with different tracking parameters) maps to one key.
+Papers are also deduplicated by the SHA-256 of their text, so a mirror of an
+already stored paper resolves to the existing ID. Each paper is written by one
+Lua script that checks both and stores the paper in a single round trip.
+
+Keys:
+- paper:{id}          hash of title, url, text, content_hash, stored_at
+- paper:{id}:tv       hash of the term vector of the stored text (the binary
+                      ids and counts fields, see text_terms) and text_len
+- papers:by_content   hash of content hash -> paper ID
+- papers:by_time      sorted set of paper IDs scored by ingestion time, used
+                      to list papers without scanning the keyspace
+
+The store script also writes the paper's term vector and adds its terms to
+terms:dict, so synthesis never re-tokenizes stored text. The vector is kept out
+of paper:{id} because it is binary: the paper hash stays readable by clients
+that decode responses, and the vector is only read with raw=True.
+"""
+import hashlib
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from document_cache import canonical_url
+from redis_client import async_redis_client
+from text_terms import TERM_DICT_KEY, term_id_key, term_vector
+
+PAPER_KEY_PREFIX = "paper:"
+PAPERS_BY_CONTENT_KEY = "papers:by_content"
+PAPERS_BY_TIME_KEY = "papers:by_time"
+TERM_VECTOR_KEY_SUFFIX = ":tv"
+PAPER_TEXT_CHARS = 4000
+# Fields that may be projected when listing papers (the text is never listed).
+PAPER_LIST_FIELDS = ("title", "url", "content_hash", "stored_at")
+
+# Returns {id, 0} for an existing paper with the same URL or content, or stores
+# the new paper and returns {id, 1}.
+_STORE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return {ARGV[1], 0}
+end
+local existing = redis.call('HGET', KEYS[2], ARGV[2])
+if existing then
+  return {existing, 0}
+end
+redis.call('HSET', KEYS[1], 'title', ARGV[3], 'url', ARGV[4], 'text', ARGV[5], 'content_hash', ARGV[2], 'stored_at', ARGV[6])
+redis.call('HSET', KEYS[5], ARGV[7], ARGV[8], ARGV[9], ARGV[10], 'text_len', ARGV[11])
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[1])
+redis.call('ZADD', KEYS[3], ARGV[6], ARGV[1])
+for i = 12, #ARGV, 2 do
+  redis.call('HSET', KEYS[4], ARGV[i], ARGV[i + 1])
+end
+return {ARGV[1], 1}
+"""
+
+
+def paper_id_for_url(url: str) -> str:
+    return hashlib.sha1(canonical_url(url).encode("utf-8")).hexdigest()[:16]
+
+
+def paper_key(paper_id: str) -> str:
+    return PAPER_KEY_PREFIX + paper_id
+
+
+def term_vector_key(key: str) -> str:
+    """The key holding the term vector of the paper stored under `key` (paper:{id})."""
+    return key + TERM_VECTOR_KEY_SUFFIX
+
+
+async def known_papers(paper_ids: List[str]) -> Dict[str, bool]:
+    """Reports which paper IDs are already stored, in one round trip."""
+    pipe = async_redis_client.pipeline(transaction=False)
+    for paper_id in paper_ids:
+        pipe.exists(paper_key(paper_id))
+    return dict(zip(paper_ids, (bool(n) for n in await pipe.execute())))
+
+
+async def store_paper(url: str, title: Optional[str], text: str) -> Tuple[str, bool]:
+    """Stores a parsed paper unless it is already known.
+
+    Returns the paper's ID either way, and whether it was newly stored.
+    """
+    paper_id = paper_id_for_url(url)
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    stored_text = text[:PAPER_TEXT_CHARS]
+    vector, names = term_vector(stored_text)
+    args = [paper_id, digest, title or "", url, stored_text, time.time()]
+    for field, value in vector.encode().items():
+        args.extend((field, value))
+    args.append(len(stored_text))
+    for tid, term in names.items():
+        args.extend((term_id_key(tid), term))
+    script = async_redis_client.client.register_script(_STORE_SCRIPT)
+    stored_id, created = await script(
+        keys=[paper_key(paper_id), PAPERS_BY_CONTENT_KEY, PAPERS_BY_TIME_KEY, TERM_DICT_KEY, term_vector_key(paper_key(paper_id))],
+        args=args,
+    )
+    return stored_id, bool(created)
+
+
+def _parse_cursor(cursor: str) -> Tuple[float, str]:
+    score, _, member = cursor.partition(":")
+    if not member:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return float(score), member
+
+
+async def list_papers(limit: int, cursor: Optional[str] = None, fields: Iterable[str] = ("title", "url")) -> Tuple[List[dict], Optional[str]]:
+    """Lists papers newest first, one page at a time.
+
+    The cursor is the "score:paper_id" of the last paper on the previous page,
+    so each page costs O(log N + limit) no matter how large the corpus is. Only
+    the requested fields are read, with one pipelined HMGET per page.
+
+    Returns the page and the cursor for the next one (None on the last page).
+    """
+    fields = list(fields)
+    redis = async_redis_client.client
+    max_score, after = _parse_cursor(cursor) if cursor else ("+inf", None)
+
+    entries = []
+    offset = 0
+    while len(entries) <= limit:
+        batch = await redis.zrevrangebyscore(PAPERS_BY_TIME_KEY, max_score, "-inf", start=offset, num=limit + 1, withscores=True)
+        if not batch:
+            break
+        offset += len(batch)
+        for member, score in batch:
+            # Equal scores come in reverse member order; skip the ones already returned.
+            if after is not None and score == max_score and member >= after:
+                continue
+            entries.append((member, score))
+        if len(batch) <= limit:
+            break
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = f"{entries[-1][1]!r}:{entries[-1][0]}"
+
+    pipe = async_redis_client.pipeline(transaction=False)
+    for paper_id, _ in entries:
+        pipe.hmget(paper_key(paper_id), fields)
+    papers = []
+    for (paper_id, _), values in zip(entries, await pipe.execute()):
+        if all(value is None for value in values):
+            continue  # deleted since it was indexed
+        paper = {field: value or "" for field, value in zip(fields, values)}
+        paper["id"] = paper_key(paper_id)
+        papers.append(paper)
+    return papers, next_cursor
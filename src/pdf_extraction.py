@@ -0,0 +1,160 @@
+"""
+PDF text extraction on a shared process pool.
+
+PyPDF2 is pure Python and CPU-bound, so extraction runs in worker processes
+instead of on the caller's thread (which is often an event loop). Documents are
+split into page ranges that are extracted in parallel and reassembled in page
+order. Extraction stops at PDF_MAX_PAGES pages or as soon as PDF_MAX_CHARS
+characters have been produced. If PDF_EXTRACT_TIMEOUT_SECONDS runs out first,
+PdfExtractionTimeout is raised with the text extracted so far, and the pool is
+replaced so workers stuck on a pathological page do not starve later documents.
+
+This module imports nothing from the application, but spawned workers also
+re-import the parent's __main__ module, so entry points that extract PDFs keep
+their own application imports out of module level (see workers.research). The
+pool defaults to at most PDF_EXTRACT_MAX_DEFAULT_WORKERS processes, since every
+API and research worker process starts its own.
+"""
+import concurrent.futures
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Union
+
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 50))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", 20000))
+PDF_PAGES_PER_CHUNK = int(os.getenv("PDF_PAGES_PER_CHUNK", 8))
+PDF_EXTRACT_TIMEOUT_SECONDS = float(os.getenv("PDF_EXTRACT_TIMEOUT_SECONDS", 60))
+PDF_EXTRACT_MAX_DEFAULT_WORKERS = 4
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", min(os.cpu_count() or 2, PDF_EXTRACT_MAX_DEFAULT_WORKERS)))
+
+# A PDF is handed to workers either as a file path or as raw bytes.
+PdfSource = Union[str, bytes]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class PdfExtractionTimeout(TimeoutError):
+    """Extraction ran out of time; `text` holds the leading pages that did finish."""
+    def __init__(self, text: str, timeout: float):
+        super().__init__(f"PDF extraction timed out after {timeout}s")
+        self.text = text
+
+
+def _get_executor() -> concurrent.futures.ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn avoids forking a process that already runs threads and event loops
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def _recycle_executor(executor: concurrent.futures.ProcessPoolExecutor, grace: float):
+    """Replaces a pool that may have workers stuck in a page.
+
+    A running task cannot be cancelled, so new work goes to a fresh pool while
+    the old one gets `grace` seconds to finish what other callers submitted to it
+    before its processes are terminated.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not executor:
+            return
+        _executor = None
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False)
+
+    def terminate():
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    timer = threading.Timer(grace, terminate)
+    timer.daemon = True
+    timer.start()
+
+
+def _open(source: PdfSource) -> PdfReader:
+    return PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+
+
+def _count_pages(source: PdfSource) -> int:
+    return len(_open(source).pages)
+
+
+def _extract_page_range(source: PdfSource, start: int, end: int, max_chars: int) -> str:
+    reader = _open(source)
+    text_parts = []
+    produced = 0
+    for index in range(start, end):
+        try:
+            text = reader.pages[index].extract_text() or ""
+        except Exception:
+            continue
+        text_parts.append(text)
+        produced += len(text)
+        if produced >= max_chars:
+            break
+    return "\n\n".join(text_parts)
+
+
+def extract_pdf_text(
+    source: PdfSource,
+    max_pages: int = PDF_MAX_PAGES,
+    max_chars: int = PDF_MAX_CHARS,
+    timeout: float = PDF_EXTRACT_TIMEOUT_SECONDS,
+) -> str:
+    """Extract plain text from a PDF path or bytes on the shared process pool.
+
+    Returns the text of the leading pages within the page and character limits;
+    page ranges that were not needed are cancelled. Raises PdfExtractionTimeout,
+    carrying the text extracted so far, if the timeout runs out first.
+    """
+    executor = _get_executor()
+    deadline = time.monotonic() + timeout
+    futures = []
+    text_parts = []
+    try:
+        page_count = executor.submit(_count_pages, source).result(timeout=timeout)
+        pages = min(page_count, max_pages)
+        futures = [
+            executor.submit(_extract_page_range, source, start, min(start + PDF_PAGES_PER_CHUNK, pages), max_chars)
+            for start in range(0, pages, PDF_PAGES_PER_CHUNK)
+        ]
+        produced = 0
+        for future in futures:
+            text = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            text_parts.append(text)
+            produced += len(text)
+            if produced >= max_chars:
+                break
+    except concurrent.futures.TimeoutError:
+        logger.warning(f"PDF extraction timed out after {timeout}s; extracted {len(text_parts)} of {len(futures)} page ranges")
+        _recycle_executor(executor, timeout)
+        raise PdfExtractionTimeout("\n\n".join(part for part in text_parts if part), timeout)
+    except BrokenProcessPool:
+        _reset_executor()
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+    return "\n\n".join(part for part in text_parts if part)
@@ -1,43 +1,94 @@
+import asyncio
 import os
+import socket
+import time
+import weakref
+from typing import List, NamedTuple, Optional
+
 import redis
+import redis.asyncio
 
 # Load environment variables before other imports
 import config
 
+# Stream that decompose_and_dispatch fills and the research workers drain.
+RESEARCH_TASK_QUEUE = "tasks:research:stream"
+
+# Field names of a task entry on a stream-backed queue (see StreamTaskQueue).
+TASK_DATA_FIELD = "data"
+TASK_ATTEMPTS_FIELD = "attempts"
+
+
+def task_entry(task_data, attempts=0):
+    return {TASK_DATA_FIELD: task_data, TASK_ATTEMPTS_FIELD: attempts}
+
+
+# Moves the entries of a list-backed queue (filled with LPUSH, so the oldest is
+# last) onto a stream and deletes the list. KEYS[1] may equal KEYS[2].
+_MIGRATE_LIST_SCRIPT = """
+if redis.call('TYPE', KEYS[1])['ok'] ~= 'list' then
+  return 0
+end
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1])
+for i = #items, 1, -1 do
+  redis.call('XADD', KEYS[2], '*', ARGV[1], items[i], ARGV[2], 0)
+end
+return #items
+"""
+
+
+def _pool_kwargs(ssl_connection_class):
+    """
+    Builds the keyword arguments shared by the sync and asyncio connection pools.
+
+    The following environment variables are used for configuration:
+    - REDIS_HOST: The hostname of the Redis server (default: 'localhost').
+    - REDIS_PORT: The port of the Redis server (default: 6379).
+    - REDIS_PASSWORD: The password for the Redis server (optional).
+    - REDIS_SSL: Set to 'true' to enable SSL/TLS (e.g., for cloud connections).
+    - REDIS_MAX_CONNECTIONS: Upper bound on pooled connections per pool (default: 50).
+    - REDIS_POOL_TIMEOUT: Seconds to wait for a free pooled connection (default: 5).
+    """
+    pool_kwargs = {
+        "host": os.getenv("REDIS_HOST", "localhost"),
+        "port": int(os.getenv("REDIS_PORT", 6379)),
+        "password": os.getenv("REDIS_PASSWORD", None),
+        "decode_responses": True,
+        "max_connections": int(os.getenv("REDIS_MAX_CONNECTIONS", 50)),
+        "timeout": float(os.getenv("REDIS_POOL_TIMEOUT", 5)),
+    }
+
+    if os.getenv("REDIS_SSL", "false").lower() == 'true':
+        pool_kwargs["connection_class"] = ssl_connection_class
+        pool_kwargs["ssl_cert_reqs"] = None
+
+    return pool_kwargs
+
+
 class RedisClient:
     def __init__(self):
         """
         Initializes the Redis client, connecting to either a local instance or a cloud-based instance (e.g., Google Cloud Memorystore).
-        
-        The following environment variables are used for configuration:
-        - REDIS_HOST: The hostname of the Redis server (default: 'localhost').
-        - REDIS_PORT: The port of the Redis server (default: 6379).
-        - REDIS_PASSWORD: The password for the Redis server (optional).
-        - REDIS_SSL: Set to 'true' to enable SSL/TLS (e.g., for cloud connections).
+
+        This is the synchronous facade used by the ADK FunctionTools and other
+        blocking code. Coroutines should use `async_redis_client` instead so that
+        Redis round trips do not stall the event loop. Connections come from a
+        bounded, blocking pool configured as described in `_pool_kwargs`.
         """
-        redis_host = os.getenv("REDIS_HOST", "localhost")
-        redis_port = int(os.getenv("REDIS_PORT", 6379))
-        redis_password = os.getenv("REDIS_PASSWORD", None)
-        redis_ssl = os.getenv("REDIS_SSL", "false").lower() == 'true'
-
-        connection_kwargs = {
-            "host": redis_host,
-            "port": redis_port,
-            "password": redis_password,
-            "decode_responses": True
-        }
-
-        if redis_ssl:
-            connection_kwargs["ssl"] = True
-            connection_kwargs["ssl_cert_reqs"] = None
+        pool_kwargs = _pool_kwargs(redis.SSLConnection)
 
         try:
-            self.client = redis.Redis(**connection_kwargs)
+            self.pool = redis.BlockingConnectionPool(**pool_kwargs)
+            self.client = redis.Redis(connection_pool=self.pool)
             self.client.ping()
-            print(f"Successfully connected to Redis at {redis_host}:{redis_port}.")
+            # Binary values are read on a separate pool that returns raw bytes; it connects lazily.
+            self.binary_client = redis.Redis(connection_pool=redis.BlockingConnectionPool(**{**pool_kwargs, "decode_responses": False}))
+            print(f"Successfully connected to Redis at {pool_kwargs['host']}:{pool_kwargs['port']}.")
         except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
             print(f"Error connecting to Redis: {e}")
             self.client = None
+            self.binary_client = None
 
     def get_client(self):
         return self.client
@@ -51,6 +102,11 @@ class RedisClient:
         if self.client:
             return self.client.rpop(queue_name)
 
+    # Stream-backed Task Queue functions (see StreamTaskQueue for consumers)
+    def enqueue_task(self, stream_name, task_data):
+        if self.client:
+            return self.client.xadd(stream_name, task_entry(task_data))
+
     # State management functions (using Hashes)
     def set_hash_field(self, hash_name, field, value):
         if self.client:
@@ -64,6 +120,19 @@ class RedisClient:
         if self.client:
             return self.client.hgetall(hash_name)
 
+    def get_hash_fields(self, hash_name, fields):
+        if self.client:
+            return self.client.hmget(hash_name, fields)
+
+    def get_hash_fields_bulk(self, hash_names, fields, raw=False):
+        """Reads the same fields from many hashes in one round trip; raw=True returns bytes, for binary fields."""
+        client = self.binary_client if raw else self.client
+        if client:
+            pipe = client.pipeline(transaction=False)
+            for hash_name in hash_names:
+                pipe.hmget(hash_name, fields)
+            return pipe.execute()
+
     # Results/Cache functions (using Strings with TTL)
     def set_with_ttl(self, key, value, ttl_seconds):
         if self.client:
@@ -73,15 +142,272 @@ class RedisClient:
         if self.client:
             return self.client.get(key)
 
+    def mget(self, keys):
+        if self.client:
+            return self.client.mget(keys)
+
     # Pub/Sub functions
     def publish_message(self, channel, message):
         if self.client:
             self.client.publish(channel, message)
 
+    def pipeline(self, transaction=True):
+        """Returns a pipeline that sends several commands in one round trip, or None without a connection."""
+        if self.client:
+            return self.client.pipeline(transaction=transaction)
+
     def subscribe_to_channel(self, channel):
         if self.client:
             pubsub = self.client.pubsub()
             pubsub.subscribe(channel)
             return pubsub
 
+
+class AsyncRedisClient:
+    def __init__(self):
+        """
+        asyncio-native counterpart of `RedisClient` with the same method surface.
+
+        redis.asyncio connections are bound to the event loop that opened them, so
+        one bounded `BlockingConnectionPool` is kept per running loop and shared by
+        every coroutine on that loop. Connections are opened lazily on first use.
+        """
+        self._pool_kwargs = _pool_kwargs(redis.asyncio.SSLConnection)
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            pool = redis.asyncio.BlockingConnectionPool(**self._pool_kwargs)
+            client = redis.asyncio.Redis(connection_pool=pool)
+            self._clients[loop] = client
+        return client
+
+    def get_client(self):
+        return self.client
+
+    async def close(self):
+        """Closes the pool owned by the current event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose(close_connection_pool=True)
+
+    # Task Queue functions (using Lists)
+    async def push_task(self, queue_name, task_data):
+        await self.client.lpush(queue_name, task_data)
+
+    async def pop_task(self, queue_name):
+        return await self.client.rpop(queue_name)
+
+    # Stream-backed Task Queue functions (see StreamTaskQueue for consumers)
+    async def enqueue_task(self, stream_name, task_data):
+        return await self.client.xadd(stream_name, task_entry(task_data))
+
+    # State management functions (using Hashes)
+    async def set_hash_field(self, hash_name, field, value):
+        await self.client.hset(hash_name, field, value)
+
+    async def get_hash_field(self, hash_name, field):
+        return await self.client.hget(hash_name, field)
+
+    async def get_all_hash_fields(self, hash_name):
+        return await self.client.hgetall(hash_name)
+
+    async def get_hash_fields(self, hash_name, fields):
+        return await self.client.hmget(hash_name, fields)
+
+    async def get_hash_fields_bulk(self, hash_names, fields):
+        """Reads the same fields from many hashes in one round trip."""
+        pipe = self.client.pipeline(transaction=False)
+        for hash_name in hash_names:
+            pipe.hmget(hash_name, fields)
+        return await pipe.execute()
+
+    # Results/Cache functions (using Strings with TTL)
+    async def set_with_ttl(self, key, value, ttl_seconds):
+        await self.client.setex(key, ttl_seconds, value)
+
+    async def get(self, key):
+        return await self.client.get(key)
+
+    async def mget(self, keys):
+        return await self.client.mget(keys)
+
+    # Pub/Sub functions
+    async def publish_message(self, channel, message):
+        await self.client.publish(channel, message)
+
+    def pipeline(self, transaction=True):
+        """Returns a pipeline that sends several commands in one round trip."""
+        return self.client.pipeline(transaction=transaction)
+
+    def pubsub(self):
+        return self.client.pubsub()
+
+    async def subscribe_to_channel(self, channel):
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(channel)
+        return pubsub
+
+
+class StreamTask(NamedTuple):
+    message_id: str
+    data: str
+    attempts: int
+
+
+class StreamTaskQueue:
+    def __init__(
+        self,
+        stream_name: str,
+        group_name: str,
+        consumer_name: Optional[str] = None,
+        client: Optional[AsyncRedisClient] = None,
+        visibility_timeout_ms: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        dead_letter_stream: Optional[str] = None,
+        legacy_list: Optional[str] = None,
+    ):
+        """
+        At-least-once task queue on a Redis Stream, consumed through a consumer group.
+
+        Producers add entries with `enqueue_task`; any number of consumers across
+        processes and nodes share the group and each entry is delivered to one of
+        them. An entry stays in the group's pending list until it is acknowledged,
+        so a crashed consumer's tasks are reclaimed with XAUTOCLAIM once they have
+        been idle for longer than the visibility timeout. A task is attempted at
+        most `1 + max_retries` times before it is moved to the dead-letter stream.
+
+        The following environment variables provide the defaults:
+        - TASK_VISIBILITY_TIMEOUT_MS: Idle time before a pending task is reclaimed (default: 60000).
+        - TASK_MAX_RETRIES: Retries before a task is dead-lettered (default: 3).
+        """
+        self.stream_name = stream_name
+        self.group_name = group_name
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+        self.client = client or async_redis_client
+        self.visibility_timeout_ms = visibility_timeout_ms or int(os.getenv("TASK_VISIBILITY_TIMEOUT_MS", 60000))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("TASK_MAX_RETRIES", 3))
+        self.dead_letter_stream = dead_letter_stream or f"{stream_name}:dead"
+        self.legacy_list = legacy_list
+        self._claim_cursor = "0-0"
+        self._last_claim = 0.0
+
+    async def ensure_group(self):
+        """Creates the stream and consumer group if they do not exist yet, after migrating the legacy list."""
+        if self.legacy_list:
+            script = self.client.client.register_script(_MIGRATE_LIST_SCRIPT)
+            await script(keys=[self.legacy_list, self.stream_name], args=[TASK_DATA_FIELD, TASK_ATTEMPTS_FIELD])
+        try:
+            await self.client.client.xgroup_create(self.stream_name, self.group_name, id="0", mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def enqueue(self, task_data: str):
+        return await self.client.enqueue_task(self.stream_name, task_data)
+
+    async def read(self, count: int = 10, block_ms: int = 5000) -> List[StreamTask]:
+        """
+        Returns up to `count` tasks for this consumer, reclaiming expired ones first.
+
+        Blocks for at most `block_ms` when nothing is available.
+        """
+        tasks = await self._claim_expired(count)
+        if len(tasks) < count:
+            response = await self.client.client.xreadgroup(
+                self.group_name,
+                self.consumer_name,
+                {self.stream_name: ">"},
+                count=count - len(tasks),
+                block=None if tasks else block_ms,
+            )
+            for _, messages in response or []:
+                for message_id, fields in messages:
+                    tasks.append(self._to_task(message_id, fields))
+        return tasks
+
+    async def ack(self, task: StreamTask):
+        """Marks a task as done and removes it from the stream."""
+        pipe = self.client.client.pipeline(transaction=True)
+        pipe.xack(self.stream_name, self.group_name, task.message_id)
+        pipe.xdel(self.stream_name, task.message_id)
+        await pipe.execute()
+
+    async def touch(self, task: StreamTask):
+        """Resets a long-running task's idle time so it is not reclaimed while still in progress."""
+        await self.client.client.xclaim(
+            self.stream_name, self.group_name, self.consumer_name, 0, [task.message_id], justid=True
+        )
+
+    async def fail(self, task: StreamTask, error: str):
+        """Re-enqueues a failed task, or dead-letters it once its retries are used up."""
+        task = task._replace(attempts=task.attempts + 1)
+        if task.attempts > self.max_retries:
+            await self._dead_letter(task, error)
+            return
+        pipe = self.client.client.pipeline(transaction=True)
+        pipe.xadd(self.stream_name, task_entry(task.data, task.attempts))
+        pipe.xack(self.stream_name, self.group_name, task.message_id)
+        pipe.xdel(self.stream_name, task.message_id)
+        await pipe.execute()
+
+    async def _claim_expired(self, count: int) -> List[StreamTask]:
+        # Reclaiming is only needed about once per visibility window, not on every read.
+        now = time.monotonic()
+        if (now - self._last_claim) * 1000 < self.visibility_timeout_ms / 4:
+            return []
+        self._last_claim = now
+
+        response = await self.client.client.xautoclaim(
+            self.stream_name,
+            self.group_name,
+            self.consumer_name,
+            min_idle_time=self.visibility_timeout_ms,
+            start_id=self._claim_cursor,
+            count=count,
+        )
+        self._claim_cursor = response[0] or "0-0"
+        claimed = [(message_id, fields) for message_id, fields in response[1] if fields]
+        if not claimed:
+            return []
+
+        # Each reclaim bumps the entry's delivery counter; crashed deliveries count as attempts.
+        pipe = self.client.client.pipeline(transaction=False)
+        for message_id, _ in claimed:
+            pipe.xpending_range(self.stream_name, self.group_name, min=message_id, max=message_id, count=1)
+        pending = await pipe.execute()
+
+        tasks = []
+        for (message_id, fields), info in zip(claimed, pending):
+            task = self._to_task(message_id, fields)
+            deliveries = info[0]["times_delivered"] if info else 1
+            task = task._replace(attempts=task.attempts + deliveries - 1)
+            if task.attempts > self.max_retries:
+                await self._dead_letter(task, "visibility timeout exceeded")
+                continue
+            tasks.append(task)
+        return tasks
+
+    async def _dead_letter(self, task: StreamTask, error: str):
+        entry = task_entry(task.data, task.attempts)
+        entry.update({"source": self.stream_name, "error": error[:1000], "failed_at": int(time.time())})
+        pipe = self.client.client.pipeline(transaction=True)
+        pipe.xadd(self.dead_letter_stream, entry)
+        pipe.xack(self.stream_name, self.group_name, task.message_id)
+        pipe.xdel(self.stream_name, task.message_id)
+        await pipe.execute()
+
+    @staticmethod
+    def _to_task(message_id, fields) -> StreamTask:
+        return StreamTask(
+            message_id=message_id,
+            data=fields.get(TASK_DATA_FIELD, ""),
+            attempts=int(fields.get(TASK_ATTEMPTS_FIELD, 0)),
+        )
+
+
 redis_client = RedisClient()
+async_redis_client = AsyncRedisClient()
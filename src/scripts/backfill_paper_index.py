@@ -0,0 +1,65 @@
+"""
+Adds papers stored before the paper indexes existed to them.
+
+Walks paper:* with SCAN (which does not block Redis the way KEYS does). Each
+paper is added to papers:by_time by its stored_at field (or the current time if
+it has none), and its stored text is added to the full-text index and the
+corpus term sketches. Safe to run repeatedly.
+
+    PYTHONPATH=src python src/scripts/backfill_paper_index.py
+"""
+import asyncio
+import time
+
+from paper_index import index_paper
+from paper_store import PAPER_KEY_PREFIX, PAPERS_BY_TIME_KEY, TERM_VECTOR_KEY_SUFFIX
+from redis_client import async_redis_client
+from term_sketch import record_paper_terms
+from text_terms import term_counts
+
+_BATCH = 500
+
+
+async def main():
+    client = async_redis_client.client
+    now = time.time()
+    indexed = 0
+    keys = []
+    async for key in client.scan_iter(match=f"{PAPER_KEY_PREFIX}*", count=1000):
+        if key.endswith(TERM_VECTOR_KEY_SUFFIX):
+            continue
+        keys.append(key)
+        if len(keys) >= _BATCH:
+            indexed += await _index(client, keys, now)
+            keys = []
+    if keys:
+        indexed += await _index(client, keys, now)
+    await async_redis_client.close()
+    print(f"Indexed {indexed} papers")
+
+
+async def _index(client, keys, now):
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.type(key)
+        pipe.hmget(key, "stored_at", "text")
+    results = await pipe.execute(raise_on_error=False)
+    scores = {}
+    for key, key_type, fields in zip(keys, results[0::2], results[1::2]):
+        if key_type != "hash":
+            continue
+        paper_id = key[len(PAPER_KEY_PREFIX):]
+        stored_at, text = fields
+        scores[paper_id] = float(stored_at or now)
+        counts = term_counts(text or "")
+        # Only papers that were not indexed yet are added to the sketches, which cannot be undone
+        if await index_paper(paper_id, counts):
+            await record_paper_terms(paper_id, counts)
+    if scores:
+        # NX keeps the original ingestion time of papers that are already indexed
+        await client.zadd(PAPERS_BY_TIME_KEY, scores, nx=True)
+    return len(scores)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,190 @@
+"""
+Single-flight coalescing of identical in-flight work.
+
+Concurrent callers that ask for the same key share one execution instead of
+each repeating it. Within a process, callers wait on the leader's result.
+Across processes, the leader holds a short Redis lease
+(singleflight:{name}:{key}); callers in other processes that find the lease
+taken poll a cheap lookup (normally the shared cache the leader writes to)
+until the result lands or the lease is released or expires. If neither
+happens, they do the work themselves.
+
+SingleFlight is for threaded callers and AsyncSingleFlight for coroutines.
+Both fall back to in-process coalescing only when Redis is unavailable.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+import weakref
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from redis_client import async_redis_client, redis_client
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_LEASE_KEY_PREFIX = "singleflight:"
+_POLL_INITIAL_SECONDS = 0.05
+_POLL_MAX_SECONDS = 1.0
+
+# Deletes the lease only if it is still held by the caller's token.
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key across threads and processes."""
+    def __init__(self, name: str, lease_seconds: float, client=None):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self._client = client or redis_client
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._release_script = None
+
+    def do(self, key: str, fn: Callable[[], T], lookup: Optional[Callable[[], Optional[T]]] = None) -> T:
+        """Runs fn once for all concurrent callers with the same key and returns its result.
+
+        lookup, if given, is polled by callers in other processes while this
+        process holds the lease; a non-None value is returned as the result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn, lookup)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def _lead(self, key: str, fn: Callable[[], T], lookup) -> T:
+        redis = self._client.get_client() if lookup else None
+        if redis is None:
+            return fn()
+
+        lease_key = f"{_LEASE_KEY_PREFIX}{self.name}:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lease_seconds
+        delay = _POLL_INITIAL_SECONDS
+        while True:
+            try:
+                acquired = redis.set(lease_key, token, nx=True, px=int(self.lease_seconds * 1000))
+            except Exception as e:
+                logger.warning(f"Single-flight lease for {lease_key} failed: {e}")
+                return fn()
+            if acquired:
+                try:
+                    return fn()
+                finally:
+                    self._release(redis, lease_key, token)
+            if time.monotonic() >= deadline:
+                return fn()
+            time.sleep(delay)
+            delay = min(delay * 2, _POLL_MAX_SECONDS)
+            result = lookup()
+            if result is not None:
+                return result
+
+    def _release(self, redis, lease_key: str, token: str):
+        try:
+            if self._release_script is None:
+                self._release_script = redis.register_script(_RELEASE_SCRIPT)
+            self._release_script(keys=[lease_key], args=[token])
+        except Exception as e:
+            logger.warning(f"Single-flight release of {lease_key} failed: {e}")
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent awaits with the same key across tasks and processes."""
+    def __init__(self, name: str, lease_seconds: float, client=None):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self._client = client or async_redis_client
+        # Shared work is a task bound to one event loop, so flights are tracked per loop.
+        self._flights = weakref.WeakKeyDictionary()
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        lookup: Optional[Callable[[], Awaitable[Optional[T]]]] = None,
+    ) -> T:
+        """Awaits one shared run of fn for all concurrent callers with the same key.
+
+        The shared run is a separate task, so a cancelled caller does not cancel
+        the work other callers are waiting for.
+        """
+        loop = asyncio.get_running_loop()
+        flights = self._flights.setdefault(loop, {})
+        task = flights.get(key)
+        if task is None:
+            task = loop.create_task(self._lead(key, fn, lookup))
+            flights[key] = task
+
+            def _forget(done):
+                if flights.get(key) is done:
+                    del flights[key]
+
+            task.add_done_callback(_forget)
+        return await asyncio.shield(task)
+
+    async def _lead(self, key: str, fn, lookup):
+        if lookup is None:
+            return await fn()
+
+        lease_key = f"{_LEASE_KEY_PREFIX}{self.name}:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lease_seconds
+        delay = _POLL_INITIAL_SECONDS
+        while True:
+            try:
+                redis = self._client.client
+                acquired = await redis.set(lease_key, token, nx=True, px=int(self.lease_seconds * 1000))
+            except Exception as e:
+                logger.warning(f"Single-flight lease for {lease_key} failed: {e}")
+                return await fn()
+            if acquired:
+                try:
+                    return await fn()
+                finally:
+                    await self._release(redis, lease_key, token)
+            if time.monotonic() >= deadline:
+                return await fn()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _POLL_MAX_SECONDS)
+            result = await lookup()
+            if result is not None:
+                return result
+
+    async def _release(self, redis, lease_key: str, token: str):
+        try:
+            await redis.register_script(_RELEASE_SCRIPT)(keys=[lease_key], args=[token])
+        except Exception as e:
+            logger.warning(f"Single-flight release of {lease_key} failed: {e}")
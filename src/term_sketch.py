@@ -0,0 +1,155 @@
+"""
+Corpus-wide streaming term statistics in fixed memory.
+
+Every newly ingested paper's term counts are folded into sketches in Redis:
+
+- sketch:cms:tf     Count-Min sketch of total term frequency
+- sketch:cms:df     Count-Min sketch of document frequency (papers containing a term)
+- sketch:hll:docs   HyperLogLog of distinct papers
+- sketch:hll:terms  HyperLogLog of distinct terms (vocabulary size)
+- sketch:topk       sorted set of the TERM_SKETCH_TOPK terms with the highest
+                    estimated frequency, maintained as papers stream in
+- sketch:totals     hash with the stream lengths (terms, postings) that bound the error
+
+Each Count-Min sketch is one Redis string of TERM_SKETCH_DEPTH rows of
+TERM_SKETCH_WIDTH unsigned 32-bit counters updated with BITFIELD, so memory
+stays at depth * width * 4 bytes per sketch no matter how large the corpus
+grows. Estimates never undercount, and with probability 1 - e^-depth they
+overcount by at most (e / width) times the stream length. The width and depth
+must not change once a sketch holds data.
+"""
+import hashlib
+import math
+import os
+from collections import Counter
+from typing import Dict, List
+
+from redis_client import async_redis_client
+
+TERM_SKETCH_WIDTH = int(os.getenv("TERM_SKETCH_WIDTH", 65536))
+TERM_SKETCH_DEPTH = int(os.getenv("TERM_SKETCH_DEPTH", 4))
+TERM_SKETCH_TOPK = int(os.getenv("TERM_SKETCH_TOPK", 1000))
+
+TF_SKETCH_KEY = "sketch:cms:tf"
+DF_SKETCH_KEY = "sketch:cms:df"
+DOCS_HLL_KEY = "sketch:hll:docs"
+TERMS_HLL_KEY = "sketch:hll:terms"
+TOPK_KEY = "sketch:topk"
+TOTALS_KEY = "sketch:totals"
+
+# ARGV: paper ID, depth, top-k size, then per term: term, count, one counter offset per row.
+_RECORD_SCRIPT = """
+local depth = tonumber(ARGV[2])
+local stride = depth + 2
+local terms, postings = 0, 0
+local names = {}
+for i = 4, #ARGV, stride do
+  local tf_ops, df_ops = {}, {}
+  for r = 1, depth do
+    local offset = '#' .. ARGV[i + 1 + r]
+    table.insert(tf_ops, 'INCRBY') table.insert(tf_ops, 'u32') table.insert(tf_ops, offset) table.insert(tf_ops, ARGV[i + 1])
+    table.insert(df_ops, 'INCRBY') table.insert(df_ops, 'u32') table.insert(df_ops, offset) table.insert(df_ops, 1)
+  end
+  local tf = redis.call('BITFIELD', KEYS[1], 'OVERFLOW', 'SAT', unpack(tf_ops))
+  redis.call('BITFIELD', KEYS[2], 'OVERFLOW', 'SAT', unpack(df_ops))
+  local estimate = tf[1]
+  for r = 2, depth do
+    if tf[r] < estimate then estimate = tf[r] end
+  end
+  redis.call('ZADD', KEYS[5], estimate, ARGV[i])
+  terms = terms + tonumber(ARGV[i + 1])
+  postings = postings + 1
+  table.insert(names, ARGV[i])
+  if #names == 500 then
+    redis.call('PFADD', KEYS[4], unpack(names))
+    names = {}
+  end
+end
+if #names > 0 then
+  redis.call('PFADD', KEYS[4], unpack(names))
+end
+redis.call('PFADD', KEYS[3], ARGV[1])
+redis.call('HINCRBY', KEYS[6], 'terms', terms)
+redis.call('HINCRBY', KEYS[6], 'postings', postings)
+redis.call('ZREMRANGEBYRANK', KEYS[5], 0, -(tonumber(ARGV[3]) + 1))
+return postings
+"""
+
+
+def _offsets(term: str) -> List[int]:
+    """Counter offsets of a term, one per row, by double hashing."""
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [row * TERM_SKETCH_WIDTH + (h1 + row * h2) % TERM_SKETCH_WIDTH for row in range(TERM_SKETCH_DEPTH)]
+
+
+async def record_paper_terms(paper_id: str, counts: Counter):
+    """Folds one newly ingested paper's term counts into the corpus sketches in one round trip."""
+    if not counts:
+        return
+    args = [paper_id, TERM_SKETCH_DEPTH, TERM_SKETCH_TOPK]
+    for term, count in counts.items():
+        args.extend((term, count, *_offsets(term)))
+    script = async_redis_client.client.register_script(_RECORD_SCRIPT)
+    await script(keys=[TF_SKETCH_KEY, DF_SKETCH_KEY, DOCS_HLL_KEY, TERMS_HLL_KEY, TOPK_KEY, TOTALS_KEY], args=args)
+
+
+def _bitfield_get(pipe, key: str, offsets: List[int]):
+    ops = []
+    for offset in offsets:
+        ops.extend(("GET", "u32", f"#{offset}"))
+    pipe.execute_command("BITFIELD", key, *ops)
+
+
+async def top_terms(k: int = 20) -> Dict:
+    """Returns the approximate top-k terms across the whole corpus with their error bounds.
+
+    Each term's frequency and document count are Count-Min estimates: they are
+    never below the true value and, with probability 1 - delta, exceed it by at
+    most the reported bound.
+    """
+    k = max(1, min(k, TERM_SKETCH_TOPK))
+    client = async_redis_client.client
+    pipe = client.pipeline(transaction=False)
+    pipe.zrevrange(TOPK_KEY, 0, k - 1)
+    pipe.pfcount(DOCS_HLL_KEY)
+    pipe.pfcount(TERMS_HLL_KEY)
+    pipe.hmget(TOTALS_KEY, "terms", "postings")
+    terms, documents, vocabulary, (total_terms, total_postings) = await pipe.execute()
+
+    pipe = client.pipeline(transaction=False)
+    for term in terms:
+        offsets = _offsets(term)
+        _bitfield_get(pipe, TF_SKETCH_KEY, offsets)
+        _bitfield_get(pipe, DF_SKETCH_KEY, offsets)
+    estimates = await pipe.execute() if terms else []
+
+    epsilon = math.e / TERM_SKETCH_WIDTH
+    frequency_bound = math.ceil(epsilon * int(total_terms or 0))
+    documents_bound = math.ceil(epsilon * int(total_postings or 0))
+    results = []
+    for i, term in enumerate(terms):
+        frequency = min(estimates[2 * i])
+        docs = min(estimates[2 * i + 1])
+        results.append({
+            "term": term,
+            "frequency": frequency,
+            "frequency_lower_bound": max(0, frequency - frequency_bound),
+            "documents": docs,
+            "documents_lower_bound": max(0, docs - documents_bound),
+        })
+    # The sorted set holds estimates from ingestion time; re-rank by the current ones.
+    results.sort(key=lambda r: (-r["frequency"], r["term"]))
+    return {
+        "terms": results,
+        "documents": documents,
+        "vocabulary": vocabulary,
+        "total_terms": int(total_terms or 0),
+        "error": {
+            "epsilon": epsilon,
+            "delta": math.exp(-TERM_SKETCH_DEPTH),
+            "frequency_bound": frequency_bound,
+            "documents_bound": documents_bound,
+        },
+    }
@@ -0,0 +1,86 @@
+"""
+Shared text normalization for term statistics and search.
+
+Text is lowercased and stripped of everything but letters and whitespace, and
+English stop words are dropped (the same rules the planning agent has always
+used), so the search index, term vectors and synthesis agree on what a term is.
+
+A term vector is a text's distinct terms as sorted 64-bit hashed term IDs with
+their counts (64 bits keep distinct terms from sharing an ID; at 32 bits even a
+few thousand terms collide). Vectors are computed once when a paper is stored
+and kept as raw little-endian arrays (8 bytes per ID, and 1 byte per count
+unless a count exceeds 255), so synthesis reads and merges small blobs instead
+of re-tokenizing text. terms:dict maps term IDs (in hex) back to terms.
+"""
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+_NON_LETTERS = re.compile(r"[^a-zA-Z\s]")
+
+
+def clean_text(text: str) -> str:
+    return _NON_LETTERS.sub("", text.lower())
+
+
+def tokenize(text: str) -> List[str]:
+    """Returns the non-stop-word terms of a text, in order."""
+    return [word for word in clean_text(text).split() if word not in ENGLISH_STOP_WORDS]
+
+
+def term_counts(text: str) -> Counter:
+    return Counter(tokenize(text))
+
+
+TERM_DICT_KEY = "terms:dict"
+# Hash fields holding a stored term vector; they are binary, so read them with raw=True.
+TERM_IDS_FIELD = "ids"
+TERM_COUNTS_FIELD = "counts"
+_ID_DTYPE = np.dtype("<u8")
+_COUNT_DTYPES = (np.dtype("u1"), np.dtype("<u2"))
+
+
+class TermVector(NamedTuple):
+    ids: np.ndarray     # sorted uint64 term IDs
+    counts: np.ndarray  # occurrences of each term
+
+    def encode(self) -> Dict[str, bytes]:
+        """Returns the vector as hash fields."""
+        small, large = _COUNT_DTYPES
+        counts = self.counts
+        dtype = small if not len(counts) or counts.max() <= np.iinfo(small).max else large
+        return {
+            TERM_IDS_FIELD: self.ids.astype(_ID_DTYPE).tobytes(),
+            TERM_COUNTS_FIELD: np.minimum(counts, np.iinfo(dtype).max).astype(dtype).tobytes(),
+        }
+
+    @classmethod
+    def decode(cls, ids: bytes, counts: bytes) -> "TermVector":
+        ids = np.frombuffer(ids, dtype=_ID_DTYPE)
+        # The counts' width follows from their length: one count per ID.
+        width = len(counts) // len(ids) if len(ids) else 1
+        return cls(ids, np.frombuffer(counts, dtype=_COUNT_DTYPES[width - 1]))
+
+
+def term_id(term: str) -> int:
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def term_id_key(tid: int) -> str:
+    """The terms:dict field for a term ID."""
+    return format(tid, "016x")
+
+
+def term_vector(text: str) -> "tuple[TermVector, Dict[int, str]]":
+    """Returns a text's term vector and the terms behind its IDs."""
+    counts = term_counts(text)
+    names = {term_id(term): term for term in counts}
+    ids = np.fromiter(names, dtype=np.uint64, count=len(names))
+    values = np.fromiter((counts[term] for term in names.values()), dtype=np.int64, count=len(names))
+    order = np.argsort(ids)
+    return TermVector(ids[order], values[order]), names
@@ -9,7 +9,7 @@ from google.cloud.speech_v1p1beta1 import SpeechAsyncClient
 from google.cloud import speech_v1p1beta1 as speech
 from google.cloud import texttospeech_v1 as tts
 
-from redis_client import redis_client
+from redis_client import async_redis_client
 
 logger = logging.getLogger(__name__)
 
@@ -30,14 +30,13 @@ class VoiceHandler:
         )
         self.session_id = str(uuid.uuid4()) # Unique session ID for Redis pub/sub
         self.pubsub_channel = f"session:{self.session_id}:response"
-        self.redis_pubsub = redis_client.pubsub()
-        self.redis_pubsub.subscribe(self.pubsub_channel)
+        self.redis_pubsub = None
         self.tts_task = None
         logger.info(f"VoiceHandler initialized for session {self.session_id}")
 
     async def _listen_for_redis_responses(self):
         logger.info(f"Listening for Redis responses on {self.pubsub_channel}")
-        for message in self.redis_pubsub.listen():
+        async for message in self.redis_pubsub.listen():
             if message['type'] == 'message':
                 data = json.loads(message['data'])
                 logger.info(f"Received Redis message: {data}")
@@ -73,6 +72,7 @@ class VoiceHandler:
             return
 
     async def handle_audio_stream(self):
+        self.redis_pubsub = await async_redis_client.subscribe_to_channel(self.pubsub_channel)
         self.tts_task = asyncio.create_task(self._listen_for_redis_responses())
 
         try:
@@ -88,7 +88,7 @@ class VoiceHandler:
                         transcript = result.alternatives[0].transcript
                         logger.info(f"Final transcript: {transcript}")
                         # Publish transcript to Redis for CoordinatorAgent
-                        redis_client.publish_message(
+                        await async_redis_client.publish_message(
                             "agent:activity",
                             json.dumps({
                                 "agent": "voice_handler",
@@ -108,7 +108,7 @@ class VoiceHandler:
                             }
                         })
                         logger.info(f"Pushing task to tasks:coordinator_voice_input: {task_payload}")
-                        redis_client.push_task("tasks:coordinator_voice_input", task_payload)
+                        await async_redis_client.enqueue_task("tasks:coordinator_voice_input", task_payload)
         except Exception as e:
             logger.error(f"Error in handle_audio_stream: {e}")
             raise
@@ -133,5 +133,7 @@ class VoiceHandler:
             self.audio_stream.cancel()
         if self.tts_task:
             self.tts_task.cancel()
-        self.redis_pubsub.unsubscribe(self.pubsub_channel)
+        if self.redis_pubsub:
+            await self.redis_pubsub.unsubscribe(self.pubsub_channel)
+            await self.redis_pubsub.aclose()
         await self.websocket.close()
\ No newline at end of file
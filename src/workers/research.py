@@ -0,0 +1,173 @@
+"""
+Standalone research worker service.
+
+Drains the `tasks:research:stream` stream filled by `decompose_and_dispatch` and
+runs `search_and_parse` for every task, so research throughput scales
+independently of the API tier. Tasks whose search fails are retried and then
+dead-lettered. Each process joins the `research` consumer group and keeps at
+most `--concurrency` tasks in flight:
+
+    python -m workers.research --processes 4 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from redis_client import StreamTask, StreamTaskQueue
+
+# Application modules (config, the research agent, redis_client) are imported
+# inside the functions below. The PDF extraction pool spawns its workers from
+# this process, and spawned children re-run this module as __mp_main__; keeping
+# those imports out of module level stops every PDF worker from loading config
+# and connecting to Redis each time the pool starts or is recycled.
+
+logger = logging.getLogger(__name__)
+
+# The list decompose_and_dispatch used to LPUSH research tasks onto.
+LEGACY_RESEARCH_TASK_LIST = "tasks:research"
+RESEARCH_CONSUMER_GROUP = "research"
+
+
+async def _heartbeat(queue: "StreamTaskQueue", task: "StreamTask"):
+    """Keeps a running task from being reclaimed by resetting its idle time every third of the visibility timeout."""
+    while True:
+        await asyncio.sleep(queue.visibility_timeout_ms / 3000)
+        try:
+            await queue.touch(task)
+        except Exception as e:
+            logger.warning(f"Could not extend research task {task.message_id}: {e}")
+
+
+async def process_task(queue: "StreamTaskQueue", task: "StreamTask"):
+    """Runs one search_and_parse task, acknowledging it and reporting its timing."""
+    from agents.research.agent import research_query
+    from redis_client import async_redis_client
+
+    started = time.perf_counter()
+    heartbeat = asyncio.create_task(_heartbeat(queue, task))
+    try:
+        body = json.loads(task.data)
+        query = body.get("payload", {}).get("query")
+        if body.get("type") != "search_and_parse" or not query:
+            logger.error(f"Dropping malformed research task {task.message_id}: {task.data}")
+            await queue.ack(task)
+            return
+        found = await research_query(query)
+    except Exception as e:
+        logger.error(f"Research task {task.message_id} failed after {time.perf_counter() - started:.2f}s: {e}")
+        await queue.fail(task, str(e))
+        return
+    finally:
+        heartbeat.cancel()
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    await queue.ack(task)
+    logger.info(f"Research task {body.get('task_id')} finished in {elapsed_ms} ms with {len(found)} papers")
+    await async_redis_client.publish_message(
+        "agent:activity",
+        json.dumps({
+            "agent": "research_worker",
+            "status": "task_completed",
+            "task_id": body.get("task_id"),
+            "query": query,
+            "found": len(found),
+            "elapsed_ms": elapsed_ms,
+        }),
+    )
+
+
+async def run_worker(concurrency: int):
+    """Consumes research tasks until SIGTERM/SIGINT, with at most `concurrency` in flight."""
+    from redis_client import RESEARCH_TASK_QUEUE, StreamTaskQueue, async_redis_client
+
+    queue = StreamTaskQueue(
+        RESEARCH_TASK_QUEUE,
+        RESEARCH_CONSUMER_GROUP,
+        visibility_timeout_ms=int(os.getenv("RESEARCH_TASK_VISIBILITY_TIMEOUT_MS", 300000)),
+        legacy_list=LEGACY_RESEARCH_TASK_LIST,
+    )
+    await queue.ensure_group()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    in_flight = set()
+    logger.info(f"Research worker {queue.consumer_name} started with concurrency {concurrency}")
+    while not stopping.is_set():
+        if len(in_flight) >= concurrency:
+            await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            continue
+        try:
+            tasks = await queue.read(count=concurrency - len(in_flight), block_ms=1000)
+        except Exception as e:
+            logger.error(f"Error reading research tasks: {e}")
+            await asyncio.sleep(1)
+            continue
+        for task in tasks:
+            job = asyncio.create_task(process_task(queue, task))
+            in_flight.add(job)
+            job.add_done_callback(in_flight.discard)
+
+    # Finish what was already claimed; anything left unacked is reclaimed by another consumer.
+    if in_flight:
+        await asyncio.wait(in_flight)
+    await async_redis_client.close()
+    logger.info(f"Research worker {queue.consumer_name} stopped")
+
+
+def _worker_process(concurrency: int):
+    # Load environment variables before the application modules
+    import config  # noqa: F401
+
+    asyncio.run(run_worker(concurrency))
+
+
+def main():
+    # Load environment variables before reading the defaults below
+    import config  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="ARGOS research worker")
+    parser.add_argument(
+        "--processes", type=int, default=int(os.getenv("RESEARCH_WORKER_PROCESSES", 2)),
+        help="Number of worker processes (env: RESEARCH_WORKER_PROCESSES).",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=int(os.getenv("RESEARCH_WORKER_CONCURRENCY", 4)),
+        help="Tasks in flight per process (env: RESEARCH_WORKER_CONCURRENCY).",
+    )
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _worker_process(args.concurrency)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=_worker_process, args=(args.concurrency,), name=f"research-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def _shutdown(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
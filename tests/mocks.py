@@ -1,5 +1,23 @@
+import asyncio
 from unittest.mock import MagicMock
 
+import fakeredis
+
+from redis_client import async_redis_client
+
+
+def run_with_fake_redis(test, client=None):
+    """
+    Runs the coroutine function `test(redis)` in a fresh event loop, with the
+    async Redis client (the shared async_redis_client unless `client` is given)
+    backed by a fresh fake Redis for that loop.
+    """
+    async def run():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        (client or async_redis_client)._clients[asyncio.get_running_loop()] = redis
+        return await test(redis)
+    return asyncio.run(run())
+
 
 class MockRedisClient:
     """A mock Redis client for testing purposes."""
@@ -20,6 +38,9 @@ class MockRedisClient:
             return self.queues[queue_name].pop()
         return None
 
+    def enqueue_task(self, stream_name, task):
+        self.queues.setdefault(stream_name, []).append(task)
+
     def publish_message(self, channel, message):
         self.published_messages[channel] = message
 
@@ -37,6 +58,12 @@ class MockRedisClient:
     def get_all_hash_fields(self, hash_name):
         return self.hashes.get(hash_name, {})
 
+    def get_hash_fields(self, hash_name, fields):
+        return [self.get_hash_field(hash_name, field) for field in fields]
+
+    def get_hash_fields_bulk(self, hash_names, fields, raw=False):
+        return [self.get_hash_fields(hash_name, fields) for hash_name in hash_names]
+
     def set_with_ttl(self, key, value, ttl):
         # The mock doesn't need to handle TTL, just store the value.
         self.hashes[key] = value
@@ -44,5 +71,8 @@ class MockRedisClient:
     def get(self, key):
         return self.hashes.get(key)
 
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
     def get_value(self, key):
         return self.get(key)
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import unittest
+
+import connection_manager
+from connection_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0, fail=False):
+        self.client = "test"
+        self.delay = delay
+        self.fail = fail
+        self.sent = []
+        self.closed = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.fail:
+            raise RuntimeError("gone")
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+    async def send_bytes(self, message):
+        await self.send_text(message)
+
+    async def close(self, code=1000, reason=None):
+        self.closed = code
+
+
+class TestConnectionManager(unittest.TestCase):
+
+    def test_slow_consumer_does_not_stall_others(self):
+        """
+        A slow client should only lose its own oldest messages under the drop policy.
+        """
+        async def run():
+            manager = ConnectionManager(queue_size=2, policy="drop")
+            fast, slow = FakeWebSocket(), FakeWebSocket(delay=10)
+            await manager.connect(fast)
+            await manager.connect(slow)
+            for i in range(5):
+                await manager.broadcast(f"m{i}")
+                await asyncio.sleep(0.01)
+            queued = list(manager.active_connections[slow].queue._queue)
+            manager.disconnect(fast)
+            manager.disconnect(slow)
+            return fast.sent, queued
+
+        sent, queued = asyncio.run(run())
+        self.assertEqual(sent, ["m0", "m1", "m2", "m3", "m4"])
+        self.assertEqual(queued, ["m3", "m4"])
+
+    def test_disconnect_policy_and_failed_sends(self):
+        """
+        Slow clients are closed under the disconnect policy, and failing clients are removed.
+        """
+        async def run():
+            manager = ConnectionManager(queue_size=1, policy="disconnect")
+            slow, broken = FakeWebSocket(delay=10), FakeWebSocket(fail=True)
+            await manager.connect(slow)
+            await manager.connect(broken)
+            for i in range(3):
+                await manager.broadcast(f"m{i}")
+                await asyncio.sleep(0.01)
+            return manager, slow, broken
+
+        manager, slow, broken = asyncio.run(run())
+        self.assertEqual(manager.active_connections, {})
+        self.assertEqual(slow.closed, 1013)
+        self.assertEqual(broken.closed, 1011)
+
+    def test_batched_json_frames(self):
+        """
+        Batched connections get one array frame per window; unbatched ones get every message.
+        """
+        async def run():
+            manager = ConnectionManager()
+            batched, plain = FakeWebSocket(), FakeWebSocket()
+            await manager.connect(batched, batch_window=0.05)
+            await manager.connect(plain)
+            for i in range(3):
+                await manager.broadcast(json.dumps({"n": i}))
+            await asyncio.sleep(0.1)
+            await manager.broadcast(json.dumps({"n": 3}))
+            await asyncio.sleep(0.1)
+            manager.disconnect(batched)
+            manager.disconnect(plain)
+            return batched.sent, plain.sent
+
+        batched, plain = asyncio.run(run())
+        self.assertEqual([json.loads(frame) for frame in batched], [[{"n": 0}, {"n": 1}, {"n": 2}], [{"n": 3}]])
+        self.assertEqual(len(plain), 4)
+
+    @unittest.skipIf(connection_manager.msgpack is None, "msgpack is not installed")
+    def test_batched_msgpack_frames(self):
+        async def run():
+            manager = ConnectionManager()
+            websocket = FakeWebSocket()
+            await manager.connect(websocket, batch_window=0.05, encoding="msgpack")
+            await manager.broadcast(json.dumps({"n": 0}))
+            await manager.broadcast("not json")
+            await asyncio.sleep(0.1)
+            manager.disconnect(websocket)
+            return websocket.sent
+
+        sent = asyncio.run(run())
+        self.assertEqual([connection_manager.msgpack.unpackb(frame) for frame in sent], [[{"n": 0}, "not json"]])
+
+    def test_unknown_encoding_is_rejected_before_accept(self):
+        websocket = FakeWebSocket()
+        with self.assertRaises(ValueError):
+            asyncio.run(ConnectionManager().connect(websocket, encoding="xml"))
+        self.assertEqual(websocket.sent, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,86 +1,117 @@
 import unittest
 import json
-from unittest.mock import MagicMock, patch, ANY
+from unittest.mock import MagicMock, patch
 
 # Ensure config is loaded before other project imports
 import config
 
-from agents.coordinator import CoordinatorAgent
+from agents.coordinator import agent as coordinator
 
 class TestCoordinatorAgent(unittest.TestCase):
 
     def setUp(self):
-        """Set up a mock Redis client before each test."""
+        """Set up a mock Redis client, an empty decomposition cache and a stubbed DSPy engine before each test."""
         self.mock_redis_client = MagicMock()
-        # To instantiate the agent, we pass the mocked client.
-        self.agent = CoordinatorAgent(redis_client=self.mock_redis_client)
+        self.pipe = self.mock_redis_client.pipeline.return_value
+        self.cache = MagicMock()
+        self.cache.get_many.side_effect = lambda queries: [None] * len(queries)
+        self.engine = MagicMock()
+        for name, mock in (("redis_client", self.mock_redis_client), ("decomposition_cache", self.cache), ("decomposition_engine", self.engine)):
+            patcher = patch.object(coordinator, name, mock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def queued_queries(self):
+        """The queries of the tasks added to the research stream, in order."""
+        queries = []
+        for call in self.pipe.xadd.call_args_list:
+            stream, entry = call.args
+            self.assertEqual(stream, coordinator.RESEARCH_TASK_QUEUE)
+            queries.append(json.loads(entry["data"])["payload"]["query"])
+        return queries
 
     def test_decompose_and_dispatch_fallback(self):
         """
         Tests the fallback heuristic decomposition when DSPy is disabled.
         """
-        # Force agent into a state where DSPy is disabled
-        self.agent.dspy_enabled = False
-        
+        # DSPy is unavailable
+        self.engine.decompose.return_value = None
+
         query = "test query"
         session_id = "test_session_123"
 
-        task_ids = self.agent.decompose_and_dispatch(query, session_id)
+        task_ids = coordinator.decompose_and_dispatch(query, session_id)
 
         # 1. Check that 5 tasks were created by the fallback heuristic
         self.assertEqual(len(task_ids), 5)
-        
-        # 2. Check that tasks were pushed to the correct Redis queue
-        self.mock_redis_client.push_task.assert_called_with("tasks:research", ANY)
-        self.assertEqual(self.mock_redis_client.push_task.call_count, 5)
+        self.assertEqual(self.queued_queries(), coordinator._fallback_tasks(query))
+
+        # 2. Check that every write went through one transactional pipeline
+        self.mock_redis_client.pipeline.assert_called_once_with(transaction=True)
+        self.pipe.execute.assert_called_once()
 
         # 3. Check that the session-to-task mapping was saved in Redis
-        self.mock_redis_client.set_hash_field.assert_called_once_with(
+        self.pipe.hset.assert_called_once_with(
             f"session:{session_id}", "tasks", json.dumps(task_ids)
         )
 
         # 4. Check that a notification was published
-        self.mock_redis_client.publish_message.assert_called_once_with(
+        self.pipe.publish.assert_called_once_with(
             "agent:activity",
             json.dumps(
                 {"agent": "coordinator", "status": "dispatched", "tasks": task_ids}
             ),
         )
 
-    @patch('dspy.Predict')
-    def test_decompose_and_dispatch_dspy(self, MockPredict):
+        # 5. Fallback decompositions are not cached
+        self.cache.put.assert_not_called()
+
+    def test_decompose_and_dispatch_dspy(self):
         """
         Tests the DSPy-powered decomposition.
         """
-        # Force agent into a state where DSPy is enabled
-        self.agent.dspy_enabled = True
-
-        # Mock the DSPy predictor and its return value
         mock_dspy_output = ["dspy task 1", "dspy task 2"]
-        mock_predictor_instance = MockPredict.return_value
-        mock_predictor_instance.return_value.tasks = json.dumps(mock_dspy_output)
+        self.engine.decompose.return_value = mock_dspy_output
 
         query = "dspy test query"
         session_id = "dspy_session_456"
 
-        task_ids = self.agent.decompose_and_dispatch(query, session_id)
+        task_ids = coordinator.decompose_and_dispatch(query, session_id)
 
-        # 1. Check that the DSPy predictor was called with the query
-        mock_predictor_instance.assert_called_once_with(query=query)
+        # 1. Check that the engine was called with the query
+        self.engine.decompose.assert_called_once_with(query)
 
         # 2. Check that the correct number of tasks were created based on mock output
         self.assertEqual(len(task_ids), 2)
+        self.assertEqual(self.queued_queries(), mock_dspy_output)
 
-        # 3. Check that tasks were pushed to Redis
-        self.assertEqual(self.mock_redis_client.push_task.call_count, 2)
-
-        # 4. Check that the session-to-task mapping was saved
-        self.mock_redis_client.set_hash_field.assert_called_once_with(
+        # 3. Check that the session-to-task mapping was saved
+        self.pipe.hset.assert_called_once_with(
             f"session:{session_id}", "tasks", json.dumps(task_ids)
         )
 
-        # 5. Check that a notification was published
-        self.mock_redis_client.publish_message.assert_called_once()
+        # 4. Check that a notification was published and the decomposition cached
+        self.pipe.publish.assert_called_once()
+        self.cache.put.assert_called_once_with(query, mock_dspy_output)
+
+    def test_decompose_and_dispatch_batch_keeps_request_order(self):
+        """
+        Batch results line up with the requests, with cache hits, DSPy results and fallbacks mixed.
+        """
+        self.cache.get_many.side_effect = lambda queries: [["cached task"] if q == "cached" else None for q in queries]
+        self.engine.decompose_batch.return_value = [["dspy task"], None]
+
+        dispatched = coordinator.decompose_and_dispatch_batch([("cached", "s1"), ("fresh", None), ("failed", "s3")])
+
+        self.cache.get_many.assert_called_once_with(["cached", "fresh", "failed"])
+        self.engine.decompose_batch.assert_called_once_with(["fresh", "failed"])
+        self.assertEqual([len(ids) for ids in dispatched], [1, 1, 5])
+        self.assertEqual(self.queued_queries(), ["cached task", "dspy task"] + coordinator._fallback_tasks("failed"))
+        self.assertEqual(
+            [call.args[0] for call in self.pipe.hset.call_args_list], ["session:s1", "session:s3"]
+        )
+        self.assertEqual(self.pipe.publish.call_count, 3)
+        self.pipe.execute.assert_called_once()
 
 if __name__ == '__main__':
     unittest.main()
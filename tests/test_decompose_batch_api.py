@@ -0,0 +1,55 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+# main mounts the built frontend at import time and fails without it
+FRONTEND_BUILT = os.path.isdir("/app/frontend/build/static")
+if FRONTEND_BUILT:
+    import main
+
+
+@unittest.skipUnless(FRONTEND_BUILT, "main needs the built frontend in /app/frontend/build")
+class TestDecomposeBatchEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def test_rejects_invalid_queries(self):
+        """
+        Empty lists, blank queries and non-string queries are rejected before anything is dispatched.
+        """
+        with patch.object(main, "decompose_and_dispatch_batch") as dispatch:
+            for payload in ({}, {"queries": []}, {"queries": ["ok", "  "]}, {"queries": [{"session_id": "s"}]}, {"queries": [1]}):
+                response = self.client.post("/api/decompose/batch", json=payload)
+                self.assertEqual(response.status_code, 400, payload)
+            dispatch.assert_not_called()
+
+    def test_rejects_oversized_batches(self):
+        with patch.object(main, "DECOMPOSE_BATCH_MAX_QUERIES", 2), \
+                patch.object(main, "decompose_and_dispatch_batch") as dispatch:
+            response = self.client.post("/api/decompose/batch", json={"queries": ["a", "b", "c"]})
+        self.assertEqual(response.status_code, 413)
+        dispatch.assert_not_called()
+
+    def test_results_follow_request_order(self):
+        """
+        Each result pairs a query with its own task IDs, and session IDs default to the top-level one.
+        """
+        with patch.object(main, "decompose_and_dispatch_batch", return_value=[["t1"], ["t2", "t3"]]) as dispatch:
+            response = self.client.post(
+                "/api/decompose/batch",
+                json={"queries": ["first", {"query": "second", "session_id": "own"}], "session_id": "shared"},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        dispatch.assert_called_once_with([("first", "shared"), ("second", "own")])
+        self.assertEqual(response.json(), {"results": [
+            {"query": "first", "tasks": ["t1"]},
+            {"query": "second", "tasks": ["t2", "t3"]},
+        ]})
+
+
+if __name__ == '__main__':
+    unittest.main()
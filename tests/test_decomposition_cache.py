@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import MagicMock
+
+import fakeredis
+
+from agents.coordinator.cache import (
+    DecompositionCache,
+    estimated_similarity,
+    minhash_signature,
+    normalize_query,
+)
+
+
+class TestMinHash(unittest.TestCase):
+
+    def test_normalize_query(self):
+        """
+        Casing, punctuation and spacing should not change the normalized query.
+        """
+        self.assertEqual(normalize_query("  What is Quantum   Error-Correction? "), "what is quantum error correction")
+
+    def test_similarity_tracks_shared_terms(self):
+        """
+        Rewordings should score close to 1, unrelated queries close to 0.
+        """
+        base = minhash_signature("What is quantum error correction?")
+        self.assertEqual(estimated_similarity(base, minhash_signature("quantum error correction")), 1.0)
+        self.assertLess(estimated_similarity(base, minhash_signature("protein folding benchmarks")), 0.2)
+
+
+class TestDecompositionCache(unittest.TestCase):
+
+    def test_disabled_without_redis(self):
+        """
+        Without a Redis connection the cache should miss and ignore writes.
+        """
+        client = MagicMock()
+        client.get_client.return_value = None
+        cache = DecompositionCache(client=client)
+        cache.put("quantum error correction", ["task"])
+        self.assertIsNone(cache.get("quantum error correction"))
+
+    def test_stop_word_queries_only_match_exactly(self):
+        """
+        Queries made only of stop words have no signature, so they must not match one another.
+        """
+        redis = fakeredis.FakeRedis(decode_responses=True)
+        client = MagicMock()
+        client.get_client.return_value = redis
+        cache = DecompositionCache(client=client)
+        cache.put("What is the...?", ["task"])
+
+        self.assertEqual(cache.get("what is the"), ["task"])
+        self.assertIsNone(cache.get("how to"))
+        self.assertEqual(redis.keys("decompose:lsh:*"), [])
+
+    def test_get_many_matches_exact_and_reworded_queries(self):
+        """
+        A bulk lookup returns results in request order, matching rewordings and missing unrelated queries.
+        """
+        redis = fakeredis.FakeRedis(decode_responses=True)
+        client = MagicMock()
+        client.get_client.return_value = redis
+        cache = DecompositionCache(client=client)
+        cache.put("quantum error correction", ["qec task"])
+
+        self.assertEqual(
+            cache.get_many(["Quantum error correction", "protein folding", "What is quantum error-correction?", "what is the"]),
+            [["qec task"], None, ["qec task"], None],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
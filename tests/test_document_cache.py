@@ -0,0 +1,105 @@
+import hashlib
+import unittest
+from unittest.mock import MagicMock, patch
+
+import fakeredis
+
+from document_cache import CachedDocument, DocumentCache, canonical_url
+
+
+class TestCanonicalUrl(unittest.TestCase):
+
+    def test_normalizes_case_ports_fragments_and_tracking_params(self):
+        """
+        Trivially different spellings of a URL should map to the same cache entry.
+        """
+        self.assertEqual(
+            canonical_url("HTTPS://ArXiv.org:443/pdf/2401.00001.pdf?utm_source=x&b=2&a=1#page=3"),
+            "https://arxiv.org/pdf/2401.00001.pdf?a=1&b=2",
+        )
+        self.assertEqual(canonical_url("http://example.com"), "http://example.com/")
+        self.assertEqual(canonical_url("http://example.com:8080/x"), "http://example.com:8080/x")
+
+
+class TestDocumentCache(unittest.TestCase):
+
+    def setUp(self):
+        """Use an in-process-only cache (no Redis tier) for each test."""
+        client = MagicMock()
+        client.get_client.return_value = None
+        self.cache = DocumentCache(client=client, memory_bytes=20)
+
+    def test_lookup_by_url_and_content_hash(self):
+        """
+        Stored text should be found by any spelling of its URL and by its content hash.
+        """
+        digest = hashlib.sha256(b"%PDF-1.4 example").hexdigest()
+        self.cache.store("http://example.com/a.pdf?utm_medium=email", digest, "hello", etag='"v1"')
+
+        cached = self.cache.lookup("http://EXAMPLE.com/a.pdf")
+        self.assertIsInstance(cached, CachedDocument)
+        self.assertEqual(cached.text, "hello")
+        self.assertEqual(cached.etag, '"v1"')
+        self.assertTrue(cached.fresh)
+        self.assertEqual(self.cache.text_for(digest), "hello")
+        self.assertIsNone(self.cache.lookup("http://example.com/other.pdf"))
+
+    def test_memory_tier_evicts_least_recently_used(self):
+        """
+        The in-process tier should stay within its byte budget, evicting LRU texts first.
+        """
+        self.cache.store("http://example.com/1", "h1", "a" * 8)
+        self.cache.store("http://example.com/2", "h2", "b" * 8)
+        self.cache.text_for("h1")  # h1 becomes most recently used
+        self.cache.store("http://example.com/3", "h3", "c" * 8)
+
+        self.assertEqual(self.cache.text_for("h1"), "a" * 8)
+        self.assertIsNone(self.cache.text_for("h2"))
+        self.assertIsNone(self.cache.lookup("http://example.com/2"))
+        self.assertEqual(self.cache.text_for("h3"), "c" * 8)
+
+
+class TestDocumentCacheRedisTier(unittest.TestCase):
+
+    def test_touch_only_refreshes_metadata(self):
+        """
+        Revalidating a document should update its fetch time without resending the text.
+        """
+        redis = fakeredis.FakeRedis(decode_responses=True)
+        client = MagicMock()
+        client.get_client.return_value = redis
+        cache = DocumentCache(client=client)
+        cache.store("http://example.com/a.pdf", "h1", "hello", etag='"v1"')
+        cached = cache.lookup("http://example.com/a.pdf")
+        url_key = cache._url_key(cached.url)
+        redis.hset(url_key, "fetched_at", 0)
+        redis.delete("doc:text:h1")
+
+        cache.touch(cached)
+
+        self.assertGreater(float(redis.hget(url_key, "fetched_at")), 0)
+        self.assertEqual(redis.hget(url_key, "etag"), '"v1"')
+        self.assertIsNone(redis.get("doc:text:h1"))
+        self.assertTrue(cache.lookup("http://example.com/a.pdf").fresh)
+
+    def test_redis_tier_evicts_least_recently_used(self):
+        """
+        Texts beyond the Redis byte budget are evicted oldest first, and the counter tracks what is left.
+        """
+        redis = fakeredis.FakeRedis(decode_responses=True)
+        client = MagicMock()
+        client.get_client.return_value = redis
+        cache = DocumentCache(client=client, redis_bytes=20)
+        for i, ts in ((1, 1.0), (2, 2.0), (3, 3.0)):
+            with patch("document_cache.time.time", return_value=ts):
+                cache.store(f"http://example.com/{i}", f"h{i}", str(i) * 8)
+
+        self.assertIsNone(redis.get("doc:text:h1"))
+        self.assertEqual(redis.get("doc:text:h2"), "2" * 8)
+        self.assertEqual(redis.get("doc:text:h3"), "3" * 8)
+        self.assertEqual(redis.zrange("doc:lru", 0, -1), ["h2", "h3"])
+        self.assertEqual(redis.get("doc:bytes"), "16")
+
+
+if __name__ == '__main__':
+    unittest.main()
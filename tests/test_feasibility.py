@@ -0,0 +1,42 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from agents.analysis import agent as analysis
+from tests.mocks import MockRedisClient
+
+
+class TestAssessFeasibility(unittest.TestCase):
+
+    def test_aggregates_across_chunks(self):
+        """
+        Results split over several MGET chunks should aggregate like a single pass.
+        """
+        redis = MockRedisClient()
+        for i, score in enumerate([2.0, 4.0, 9.0]):
+            redis.set_with_ttl(f"synthesis:{i}", json.dumps({"overlap": [f"t{i}"], "feasibility": score}), 3600)
+        redis.set_with_ttl("synthesis:bad", "not json", 3600)
+        keys = ["synthesis:0", "synthesis:missing", "synthesis:1", "synthesis:bad", "synthesis:2"]
+
+        with patch.object(analysis, "redis_client", redis), patch.object(analysis, "ANALYSIS_MGET_CHUNK", 2):
+            result = analysis.assess_feasibility(keys)
+
+        self.assertEqual(result["score"], 5.0)
+        self.assertEqual([s["key"] for s in result["sources"]], ["synthesis:0", "synthesis:1", "synthesis:2"])
+
+    def test_analysis_keys_do_not_collide(self):
+        """
+        Two analyses run back to back should be stored under different keys.
+        """
+        redis = MockRedisClient()
+        keys = []
+        with patch.object(analysis, "redis_client", redis):
+            for _ in range(2):
+                analysis.assess_feasibility([])
+                keys.append(json.loads(redis.get_published_message("agent:activity"))["key"])
+        self.assertNotEqual(keys[0], keys[1])
+        self.assertTrue(all(key.startswith("analysis:") for key in keys))
+
+
+if __name__ == '__main__':
+    unittest.main()
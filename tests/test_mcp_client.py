@@ -0,0 +1,71 @@
+import asyncio
+import json
+import threading
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from mcp_client import TavilyMCPPool, search_cache_key
+from tests.mocks import run_with_fake_redis
+
+
+class TestTavilyMCPPoolCache(unittest.TestCase):
+
+    def test_cache_hit_does_not_start_the_pool(self):
+        """
+        Cached results are served even when no MCP server can be started.
+        """
+        async def test(redis):
+            await redis.set(search_cache_key("Graph  Networks!"), json.dumps({"results": [{"url": "u"}]}))
+            pool = TavilyMCPPool(size=1)
+            with patch.object(pool, "_ensure_loop", side_effect=RuntimeError("node missing")):
+                result = await pool.search("graph networks")
+            return result, pool._loop, await redis.hget("search:cache:stats", "hits")
+
+        result, loop, hits = run_with_fake_redis(test)
+        self.assertEqual(result, {"results": [{"url": "u"}]})
+        self.assertIsNone(loop)
+        self.assertEqual(hits, "1")
+
+    def test_miss_searches_once_and_caches(self):
+        calls = []
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+
+        async def fake_search(query, **kwargs):
+            calls.append(query)
+            await asyncio.sleep(0.05)
+            return {"results": [{"url": "u"}]}
+
+        async def test(redis):
+            pool = TavilyMCPPool(size=1)
+            with patch.object(pool, "_ensure_loop", return_value=loop), patch.object(pool, "_search", fake_search):
+                results = await asyncio.gather(pool.search("q"), pool.search("q"))
+            return results, await redis.get(search_cache_key("q"))
+
+        try:
+            results, cached = run_with_fake_redis(test)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+        self.assertEqual(calls, ["q"])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(json.loads(cached), {"results": [{"url": "u"}]})
+
+
+class TestTavilyMCPPoolRespawn(unittest.TestCase):
+
+    def test_failed_respawn_is_not_retried(self):
+        """
+        When an unhealthy slot cannot be restarted, the search fails with that error without spawning again.
+        """
+        pool = TavilyMCPPool(size=1)
+        respawn = AsyncMock(side_effect=RuntimeError("node missing"))
+        with patch.object(pool, "_respawn", respawn):
+            with self.assertRaisesRegex(RuntimeError, "node missing"):
+                asyncio.run(pool._search("q"))
+        respawn.assert_awaited_once()
+        self.assertEqual(pool._slots[0].in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
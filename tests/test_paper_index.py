@@ -0,0 +1,41 @@
+import unittest
+from collections import Counter
+
+import paper_index
+from tests.mocks import run_with_fake_redis
+
+
+class TestPaperIndex(unittest.TestCase):
+
+    def test_index_paper_counts_each_paper_once(self):
+        """
+        Re-indexing a paper leaves its postings in place and does not inflate the corpus stats.
+        """
+        async def test(redis):
+            added = [
+                await paper_index.index_paper("p1", Counter({"graph": 2, "networks": 1})),
+                await paper_index.index_paper("p1", Counter({"graph": 2, "networks": 1})),
+                await paper_index.index_paper("p2", Counter({"graph": 1, "molecules": 3})),
+            ]
+            return added, await redis.hgetall(paper_index.STATS_KEY), await redis.hgetall("idx:term:graph")
+
+        added, stats, postings = run_with_fake_redis(test)
+        self.assertEqual(added, [True, False, True])
+        self.assertEqual(stats, {"docs": "2", "total_len": "7"})
+        self.assertEqual(postings, {"p1": "2", "p2": "1"})
+
+    def test_search_ranks_by_bm25(self):
+        async def test(redis):
+            await redis.hset("paper:p1", mapping={"title": "Graphs", "url": "u1"})
+            await paper_index.index_paper("p1", Counter({"graph": 3, "networks": 1}))
+            await paper_index.index_paper("p2", Counter({"graph": 1, "molecules": 3}))
+            await paper_index.index_paper("p3", Counter({"molecules": 1}))
+            return await paper_index.search_papers_index("Graph networks", limit=5)
+
+        results = run_with_fake_redis(test)
+        self.assertEqual([r["id"] for r in results], ["paper:p1", "paper:p2"])
+        self.assertEqual((results[0]["title"], results[0]["url"]), ("Graphs", "u1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import unittest
+
+from fastapi.testclient import TestClient
+
+from paper_store import PAPERS_BY_TIME_KEY, list_papers, paper_key, store_paper, term_vector_key
+from text_terms import TERM_DICT_KEY, term_id, term_id_key
+from tests.mocks import run_with_fake_redis
+
+# main mounts the built frontend at import time and fails without it
+FRONTEND_BUILT = os.path.isdir("/app/frontend/build/static")
+if FRONTEND_BUILT:
+    import main
+
+
+async def add_papers(redis, papers):
+    """Indexes `papers`, a list of (paper_id, stored_at) pairs, each with a title."""
+    for paper_id, stored_at in papers:
+        await redis.hset(f"paper:{paper_id}", mapping={"title": f"Title {paper_id}", "url": f"u/{paper_id}"})
+        await redis.zadd(PAPERS_BY_TIME_KEY, {paper_id: stored_at})
+
+
+async def all_pages(limit):
+    """Follows next_cursor from the first page to the last, returning the IDs of every page."""
+    pages, cursor = [], None
+    while True:
+        papers, cursor = await list_papers(limit, cursor=cursor, fields=["title"])
+        pages.append([paper["id"] for paper in papers])
+        if cursor is None:
+            return pages
+
+
+class TestListPapers(unittest.TestCase):
+
+    def test_pages_through_equal_scores_without_gaps_or_repeats(self):
+        """
+        Papers stored in the same instant are split across pages in a stable order, each listed once.
+        """
+        async def test(redis):
+            await add_papers(redis, [("a", 10), ("b", 10), ("c", 10), ("d", 10), ("e", 10), ("old", 5)])
+            return await all_pages(limit=2)
+
+        pages = run_with_fake_redis(test)
+        self.assertEqual(pages, [
+            ["paper:e", "paper:d"],
+            ["paper:c", "paper:b"],
+            ["paper:a", "paper:old"],
+        ])
+
+    def test_refills_a_page_when_ties_are_skipped(self):
+        """
+        When a fetched batch is only ties already returned, further batches are read to fill the page.
+        """
+        async def test(redis):
+            await add_papers(redis, [("a", 10), ("b", 10), ("c", 10), ("d", 10), ("old", 5)])
+            return await list_papers(1, cursor="10.0:b", fields=["title"])
+
+        papers, cursor = run_with_fake_redis(test)
+        self.assertEqual(papers, [{"title": "Title a", "id": "paper:a"}])
+        self.assertEqual(cursor, "10.0:a")
+
+    def test_skips_deleted_papers(self):
+        async def test(redis):
+            await add_papers(redis, [("a", 1), ("b", 2)])
+            await redis.delete("paper:b")
+            return await list_papers(5, fields=["title", "url"])
+
+        papers, cursor = run_with_fake_redis(test)
+        self.assertEqual(papers, [{"title": "Title a", "url": "u/a", "id": "paper:a"}])
+        self.assertIsNone(cursor)
+
+    def test_malformed_cursor_raises_value_error(self):
+        async def test(redis):
+            for cursor in ("no-separator", "not-a-score:a", "10.0:"):
+                with self.assertRaises(ValueError, msg=cursor):
+                    await list_papers(5, cursor=cursor)
+
+        run_with_fake_redis(test)
+
+
+class TestStorePaper(unittest.TestCase):
+
+    def test_paper_hash_stays_text_and_vector_is_stored_apart(self):
+        """
+        The paper hash decodes as text; its binary term vector lives under its own key.
+        """
+        async def test(redis):
+            paper_id, created = await store_paper("http://example.com/a.pdf", "A", "aadze aadze aadze akamk")
+            return (
+                created,
+                await redis.hgetall(paper_key(paper_id)),
+                await redis.hget(term_vector_key(paper_key(paper_id)), "text_len"),
+                await redis.hgetall(TERM_DICT_KEY),
+            )
+
+        created, paper, text_len, terms = run_with_fake_redis(test)
+        self.assertTrue(created)
+        self.assertEqual(set(paper), {"title", "url", "text", "content_hash", "stored_at"})
+        self.assertEqual(text_len, "23")
+        self.assertEqual(terms, {term_id_key(term_id("aadze")): "aadze", term_id_key(term_id("akamk")): "akamk"})
+
+
+@unittest.skipUnless(FRONTEND_BUILT, "main needs the built frontend in /app/frontend/build")
+class TestListPapersEndpoint(unittest.TestCase):
+
+    def test_malformed_cursor_is_a_bad_request(self):
+        response = TestClient(main.app).get("/api/papers", params={"cursor": "x"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"detail": "Invalid cursor: 'x'"})
+
+
+if __name__ == '__main__':
+    unittest.main()
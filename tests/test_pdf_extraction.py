@@ -0,0 +1,64 @@
+import hashlib
+import unittest
+from unittest.mock import MagicMock, patch
+
+import paper_parser
+import pdf_extraction
+from document_cache import DocumentCache
+from pdf_extraction import PdfExtractionTimeout
+
+
+class FakeResponse:
+    status_code = 200
+    encoding = None
+    url = "http://example.com/a.pdf"
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.headers = {"Content-Type": "application/pdf", "ETag": '"v1"'}
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class TestPdfExtraction(unittest.TestCase):
+
+    def test_timeout_raises_and_recycles_the_pool(self):
+        """
+        A timed-out extraction should raise rather than pass for a complete result, and replace the pool.
+        """
+        executor = pdf_extraction._get_executor()
+        try:
+            with self.assertRaises(PdfExtractionTimeout) as raised:
+                pdf_extraction.extract_pdf_text(b"%PDF-1.4", timeout=0.001)
+            self.assertEqual(raised.exception.text, "")
+            self.assertIsNot(pdf_extraction._get_executor(), executor)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+class TestTimedOutExtractionIsNotCached(unittest.TestCase):
+
+    def test_partial_text_is_returned_but_not_cached(self):
+        client = MagicMock()
+        client.get_client.return_value = None
+        cache = DocumentCache(client=client)
+        timeout = PdfExtractionTimeout("first pages", 60)
+        with patch.object(paper_parser, "document_cache", cache), \
+                patch.object(paper_parser.requests, "get", return_value=FakeResponse(b"%PDF-1.4 body")), \
+                patch.object(paper_parser, "extract_pdf_text", side_effect=timeout):
+            text = paper_parser._extract_text_from_http("http://example.com/a.pdf")
+
+        self.assertEqual(text, "first pages")
+        self.assertIsNone(cache.lookup("http://example.com/a.pdf"))
+        self.assertIsNone(cache.text_for(hashlib.sha256(b"%PDF-1.4 body").hexdigest()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import redis_client
+from agents.research import agent as research_agent
+from redis_client import StreamTask
+from workers import research
+
+
+class TestResearchWorker(unittest.TestCase):
+
+    def test_search_failure_fails_the_task(self):
+        """
+        A failed search must not be acknowledged as done, so the queue can retry it.
+        """
+        queue = AsyncMock()
+        task = StreamTask("1-0", json.dumps({"type": "search_and_parse", "payload": {"query": "q"}}), 0)
+        with patch.object(research_agent, "research_query", AsyncMock(side_effect=RuntimeError("search down"))):
+            asyncio.run(research.process_task(queue, task))
+
+        queue.fail.assert_awaited_once_with(task, "search down")
+        queue.ack.assert_not_awaited()
+
+    def test_successful_task_is_acknowledged(self):
+        queue = AsyncMock()
+        task = StreamTask("1-0", json.dumps({"type": "search_and_parse", "payload": {"query": "q"}}), 0)
+        with patch.object(research_agent, "research_query", AsyncMock(return_value=["p1"])), \
+                patch.object(redis_client, "async_redis_client", AsyncMock()):
+            asyncio.run(research.process_task(queue, task))
+
+        queue.ack.assert_awaited_once_with(task)
+        queue.fail.assert_not_awaited()
+
+    def test_long_task_is_kept_alive(self):
+        """
+        A task that outlives a third of the visibility timeout has its idle time reset until it finishes.
+        """
+        queue = AsyncMock(visibility_timeout_ms=30)
+        task = StreamTask("1-0", json.dumps({"type": "search_and_parse", "payload": {"query": "q"}}), 0)
+
+        async def slow_search(query):
+            await asyncio.sleep(0.05)
+            return ["p1"]
+
+        with patch.object(research_agent, "research_query", slow_search), \
+                patch.object(redis_client, "async_redis_client", AsyncMock()):
+            asyncio.run(research.process_task(queue, task))
+
+        queue.touch.assert_awaited_with(task)
+        queue.ack.assert_awaited_once_with(task)
+
+
+if __name__ == '__main__':
+    unittest.main()
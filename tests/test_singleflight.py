@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        """Coalesce within the process only (no Redis lease)."""
+        client = MagicMock()
+        client.get_client.return_value = None
+        self.flight = SingleFlight("test", lease_seconds=1, client=client)
+
+    def test_concurrent_callers_share_one_call(self):
+        """
+        Threads asking for the same key at the same time should all get the leader's result.
+        """
+        calls = []
+
+        def work():
+            calls.append(1)
+            time.sleep(0.1)
+            return "text"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.flight.do("k", work, lookup=lambda: None))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["text"] * 5)
+
+    def test_errors_reach_waiters_and_are_not_remembered(self):
+        """
+        A failed call should raise for every waiter, and the next call should run again.
+        """
+        with self.assertRaises(ValueError):
+            self.flight.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+        self.assertEqual(self.flight.do("k", lambda: "ok"), "ok")
+
+
+class TestAsyncSingleFlight(unittest.TestCase):
+
+    def test_concurrent_awaits_share_one_call(self):
+        """
+        Coroutines awaiting the same key should share a single run of the work.
+        """
+        flight = AsyncSingleFlight("test", lease_seconds=1)
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"results": []}
+
+        async def run():
+            return await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"results": []}] * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
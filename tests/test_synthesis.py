@@ -0,0 +1,116 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from agents.planning import agent as planning
+from paper_store import term_vector_key
+from tests.mocks import MockRedisClient
+from text_terms import TERM_DICT_KEY, TermVector, term_id_key, term_vector
+
+
+class TestOverlapTerms(unittest.TestCase):
+
+    def test_ranks_shared_terms_by_total_frequency(self):
+        """
+        Only terms in several documents count, most frequent first, ties alphabetical.
+        """
+        texts = [
+            "Quantum quantum circuits and error codes.",
+            "Quantum error correction for circuits.",
+            "Surface codes, quantum memory.",
+        ]
+        self.assertEqual(planning._overlap_terms(texts), ["quantum", "circuits", "codes", "error"])
+        self.assertEqual(planning._overlap_terms(texts, k=2), ["quantum", "circuits"])
+
+    def test_no_shared_terms(self):
+        self.assertEqual(planning._overlap_terms(["alpha", "beta"]), [])
+        self.assertEqual(planning._overlap_terms(["the of and"]), [])
+
+
+class TestTermVector(unittest.TestCase):
+
+    def test_round_trips_as_compact_bytes(self):
+        """
+        Vectors encode to 8 bytes per ID and 1 byte per count, widening counts only when needed.
+        """
+        vector, names = term_vector("graph graph neural networks")
+        encoded = vector.encode()
+        self.assertEqual([len(v) for v in encoded.values()], [24, 3])
+        decoded = TermVector.decode(*encoded.values())
+        self.assertEqual(decoded.ids.tolist(), vector.ids.tolist())
+        self.assertEqual(dict(zip((names[int(t)] for t in decoded.ids), decoded.counts.tolist())), {"graph": 2, "neural": 1, "networks": 1})
+
+        vector, _ = term_vector("graph " * 300)
+        encoded = vector.encode()
+        self.assertEqual([len(v) for v in encoded.values()], [8, 2])
+        self.assertEqual(TermVector.decode(*encoded.values()).counts.tolist(), [300])
+
+    def test_distinct_terms_keep_distinct_ids(self):
+        """
+        Terms whose 32-bit hashes collide must still be counted separately.
+        """
+        vector, names = term_vector("aadze aadze aadze akamk")
+        self.assertEqual(dict(zip((names[int(t)] for t in vector.ids), vector.counts.tolist())), {"aadze": 3, "akamk": 1})
+
+
+class TestSynthesize(unittest.TestCase):
+
+    def test_synthesize_stores_and_publishes(self):
+        """
+        Synthesis should read the papers, store the result and announce it.
+        """
+        redis = MockRedisClient()
+        redis.set_hash_field("paper:1", "text", "graph neural networks for molecules")
+        redis.set_hash_field("paper:2", "text", "neural networks predict molecules")
+        with patch.object(planning, "redis_client", redis):
+            result = planning.synthesize(["paper:1", "paper:2"], "synthesis:test")
+
+        self.assertEqual(result["overlap"], ["molecules", "networks", "neural"])
+        self.assertEqual(json.loads(redis.get_value("synthesis:test")), result)
+        self.assertEqual(json.loads(redis.get_published_message("agent:activity"))["key"], "synthesis:test")
+
+    def test_synthesize_uses_stored_term_vectors(self):
+        """
+        Papers stored with term vectors should synthesize the same as raw text, without reading the text.
+        """
+        redis = MockRedisClient()
+        for pid, text in (("paper:1", "graph neural networks for molecules"), ("paper:2", "neural networks predict molecules")):
+            vector, names = term_vector(text)
+            for field, value in vector.encode().items():
+                redis.set_hash_field(term_vector_key(pid), field, value)
+            redis.set_hash_field(term_vector_key(pid), "text_len", str(len(text)))
+            for tid, term in names.items():
+                redis.set_hash_field(TERM_DICT_KEY, term_id_key(tid), term)
+        with patch.object(planning, "redis_client", redis):
+            result = planning.synthesize(["paper:1", "paper:2"], "synthesis:test")
+
+        self.assertEqual(result["overlap"], ["molecules", "networks", "neural"])
+
+    def test_memo_key_ignores_order_and_tracks_content_versions(self):
+        """
+        The same papers in any order and spelling reuse the memoized result until a paper's content changes.
+        """
+        redis = MockRedisClient()
+        for pid, text, version in (("paper:1", "graph neural networks", "h1"), ("paper:2", "neural networks predict", "h2")):
+            redis.set_hash_field(pid, "text", text)
+            redis.set_hash_field(pid, "content_hash", version)
+
+        def run(paper_ids):
+            with patch.object(planning, "_synthesize", wraps=planning._synthesize) as computed, \
+                    patch.object(planning, "redis_client", redis):
+                planning.synthesize(paper_ids)
+            event = json.loads(redis.get_published_message("agent:activity"))
+            return event["key"], event["cached"], computed.call_count
+
+        first_key, cached, computed = run(["paper:2", "paper:1"])
+        self.assertEqual((cached, computed), (False, 1))
+        self.assertEqual(run(["1", "paper:2", "paper:1"]), (first_key, True, 0))
+
+        redis.set_hash_field("paper:1", "content_hash", "h1-revised")
+        changed_key, cached, computed = run(["paper:1", "paper:2"])
+        self.assertNotEqual(changed_key, first_key)
+        self.assertEqual((cached, computed), (False, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+
+from redis_client import AsyncRedisClient, StreamTaskQueue
+from tests.mocks import run_with_fake_redis
+
+
+def run_with_queue(test, **kwargs):
+    """Runs `test(queue, redis)` on a fresh fake Redis with a StreamTaskQueue on tasks:test."""
+    client = AsyncRedisClient()
+
+    async def with_queue(redis):
+        kwargs.setdefault("consumer_name", "a")
+        queue = StreamTaskQueue("tasks:test", "workers", client=client, **kwargs)
+        return await test(queue, redis)
+    return run_with_fake_redis(with_queue, client=client)
+
+
+class TestStreamTaskQueue(unittest.TestCase):
+
+    def test_read_and_ack(self):
+        """
+        Acknowledged tasks leave both the stream and the pending list.
+        """
+        async def test(queue, redis):
+            await queue.ensure_group()
+            await queue.enqueue("t1")
+            await queue.enqueue("t2")
+            tasks = await queue.read(count=10, block_ms=10)
+            for task in tasks:
+                await queue.ack(task)
+            pending = await redis.xpending("tasks:test", "workers")
+            return tasks, await redis.xlen("tasks:test"), pending["pending"]
+
+        tasks, length, pending = run_with_queue(test)
+        self.assertEqual([(t.data, t.attempts) for t in tasks], [("t1", 0), ("t2", 0)])
+        self.assertEqual((length, pending), (0, 0))
+
+    def test_fail_retries_then_dead_letters(self):
+        """
+        A failed task is re-enqueued with its attempt count until max_retries, then dead-lettered.
+        """
+        async def test(queue, redis):
+            await queue.ensure_group()
+            await queue.enqueue("t1")
+            attempts = []
+            for _ in range(2):
+                task, = await queue.read(count=1, block_ms=10)
+                attempts.append(task.attempts)
+                await queue.fail(task, "boom")
+            dead = await redis.xrange("tasks:test:dead")
+            return attempts, await redis.xlen("tasks:test"), dead
+
+        attempts, length, dead = run_with_queue(test, max_retries=1)
+        self.assertEqual(attempts, [0, 1])
+        self.assertEqual(length, 0)
+        self.assertEqual(len(dead), 1)
+        fields = dead[0][1]
+        self.assertEqual((fields["data"], fields["attempts"], fields["error"], fields["source"]), ("t1", "2", "boom", "tasks:test"))
+
+    def test_reclaims_expired_tasks(self):
+        """
+        Tasks left unacknowledged past the visibility timeout are claimed by another consumer.
+        """
+        async def test(queue, redis):
+            await queue.ensure_group()
+            await queue.enqueue("t1")
+            await queue.read(count=1, block_ms=10)
+            await asyncio.sleep(0.1)
+            other = StreamTaskQueue("tasks:test", "workers", consumer_name="b", client=queue.client, visibility_timeout_ms=50)
+            return await other.read(count=1, block_ms=10)
+
+        tasks = run_with_queue(test, visibility_timeout_ms=50)
+        self.assertEqual([(t.data, t.attempts) for t in tasks], [("t1", 1)])
+
+    def test_reclaim_dead_letters_exhausted_tasks(self):
+        async def test(queue, redis):
+            await queue.ensure_group()
+            await queue.enqueue("t1")
+            await queue.read(count=1, block_ms=10)
+            await asyncio.sleep(0.1)
+            queue._last_claim = 0.0
+            tasks = await queue.read(count=1, block_ms=10)
+            return tasks, await redis.xrange("tasks:test:dead")
+
+        tasks, dead = run_with_queue(test, visibility_timeout_ms=50, max_retries=0)
+        self.assertEqual(tasks, [])
+        self.assertEqual(dead[0][1]["error"], "visibility timeout exceeded")
+
+    def test_migrates_legacy_list(self):
+        """
+        Tasks LPUSHed onto the legacy list are moved onto the stream oldest first, even under the same key.
+        """
+        async def test(queue, redis):
+            await redis.lpush("tasks:test", "t1", "t2")
+            await queue.ensure_group()
+            tasks = await queue.read(count=10, block_ms=10)
+            return tasks, await redis.type("tasks:test")
+
+        tasks, key_type = run_with_queue(test, legacy_list="tasks:test")
+        self.assertEqual([t.data for t in tasks], ["t1", "t2"])
+        self.assertEqual(key_type, "stream")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import math
+import random
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+import term_sketch
+from tests.mocks import run_with_fake_redis
+
+
+def random_papers(n, vocabulary, seed=7):
+    """Returns `n` (paper_id, term counts) pairs drawn from a skewed vocabulary."""
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(vocabulary)]
+    weights = [1 / (i + 1) for i in range(vocabulary)]
+    return [(f"p{i}", Counter(rng.choices(words, weights, k=rng.randint(5, 40)))) for i in range(n)]
+
+
+class TestTermSketch(unittest.TestCase):
+
+    def setUp(self):
+        """Use tiny sketches so that counters collide and the top-k set has to be trimmed."""
+        for name, value in (("TERM_SKETCH_WIDTH", 16), ("TERM_SKETCH_DEPTH", 3), ("TERM_SKETCH_TOPK", 5)):
+            patcher = patch.object(term_sketch, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_estimates_never_undercount_and_top_k_is_trimmed(self):
+        """
+        Count-Min estimates are at least the true counts, and only TERM_SKETCH_TOPK terms are kept, best first.
+        """
+        papers = random_papers(30, vocabulary=60)
+
+        async def test(redis):
+            for paper_id, counts in papers:
+                await term_sketch.record_paper_terms(paper_id, counts)
+            return await term_sketch.top_terms(k=50), await redis.zcard(term_sketch.TOPK_KEY)
+
+        result, kept = run_with_fake_redis(test)
+        frequency = sum((counts for _, counts in papers), Counter())
+        documents = Counter(term for _, counts in papers for term in counts)
+
+        self.assertEqual(kept, 5)
+        self.assertEqual(len(result["terms"]), 5)
+        for entry in result["terms"]:
+            term = entry["term"]
+            self.assertGreaterEqual(entry["frequency"], frequency[term], term)
+            self.assertGreaterEqual(entry["documents"], documents[term], term)
+            self.assertLessEqual(entry["frequency_lower_bound"], entry["frequency"])
+            self.assertLessEqual(entry["documents_lower_bound"], entry["documents"])
+        self.assertEqual(
+            [entry["term"] for entry in result["terms"]],
+            [entry["term"] for entry in sorted(result["terms"], key=lambda e: (-e["frequency"], e["term"]))],
+        )
+        self.assertEqual(result["total_terms"], sum(frequency.values()))
+        self.assertEqual(result["documents"], 30)
+        self.assertEqual(result["vocabulary"], len(frequency))
+        self.assertEqual(result["error"]["frequency_bound"], math.ceil(math.e / 16 * sum(frequency.values())))
+        # The sketch is small enough that collisions inflate some estimates
+        self.assertTrue(any(entry["frequency"] > frequency[entry["term"]] for entry in result["terms"]))
+        self.assertIn(frequency.most_common(1)[0][0], [entry["term"] for entry in result["terms"]])
+
+    def test_empty_sketch(self):
+        async def test(redis):
+            await term_sketch.record_paper_terms("p1", Counter())
+            return await term_sketch.top_terms()
+
+        result = run_with_fake_redis(test)
+        self.assertEqual((result["terms"], result["documents"], result["total_terms"]), ([], 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()